@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import Cart, CartItem
 
 class CartAdmin(admin.ModelAdmin):
-    list_display = ('cart_id', 'date_added')
+    list_display = ('cart_id', 'date_added', 'last_activity')
 
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ('product', 'cart', 'quantity', 'is_active')
@@ -1,20 +1,8 @@
-from .models import Cart, CartItem
-from carts.utils import _cart_id
+from carts.utils import cart_count
+from store.lazy import lazy_context
 
 
 def counter(request):
-    cart_count = 0
     if 'admin' in request.path:
         return {}
-    else:
-        try:
-            cart = Cart.objects.filter(cart_id= _cart_id(request))
-            if request.user.is_authenticated:
-                cart_items = CartItem.objects.all().filter(user=request.user)
-            else:
-                cart_items = CartItem.objects.all().filter(cart=cart[:1])
-            for cart_item in cart_items:
-                cart_count += cart_item.quantity
-        except Cart.DoesNotExist:
-            cart_count = 0
-    return dict(cart_count=cart_count)
+    return dict(cart_count=lazy_context(request, 'cart_count', cart_count, request))
@@ -0,0 +1,104 @@
+"""
+Housekeeping for anonymous database carts.
+
+Every anonymous visitor who adds to a database cart leaves a Cart row (and its
+CartItem / variation rows) behind; nothing reaches them once the session is
+gone. purge_stale_carts() deletes the ones idle for longer than a cutoff in
+short transactions of `batch_size` carts, so writers are never blocked for
+long. Run it from cron (or any scheduler) through the management command:
+
+    15 3 * * *  cd /srv/estore && python manage.py purge_stale_carts
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+STALE_AFTER_DAYS = getattr(settings, 'CART_STALE_DAYS', 30)
+PURGE_BATCH_SIZE = getattr(settings, 'CART_PURGE_BATCH_SIZE', 500)
+
+
+def stale_carts(max_age_days=STALE_AFTER_DAYS, now=None):
+    """Carts with no activity for `max_age_days` (carts from before last_activity existed go by date_added)."""
+    cutoff = (now or timezone.now()) - timedelta(days=max_age_days)
+    return Cart.objects.filter(
+        Q(last_activity__lt=cutoff) | Q(last_activity__isnull=True, date_added__lt=cutoff.date())
+    )
+
+
+def _average_row_bytes(model):
+    """
+    Average on-disk bytes per row of `model`'s table, indexes included, or
+    None when the backend cannot tell (SQLite without dbstat, other vendors).
+    """
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s::regclass)', [table])
+            else:
+                return None
+            size = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    rows = model._default_manager.count()
+    if not size or not rows:
+        return None
+    return size / rows
+
+
+def purge_stale_carts(max_age_days=STALE_AFTER_DAYS, batch_size=PURGE_BATCH_SIZE, pause=0.0, dry_run=False):
+    """
+    Delete stale carts `batch_size` at a time, each batch picked and deleted
+    in its own transaction (staleness is re-checked on delete, so a cart
+    touched since it was picked survives). Returns {model label: rows} and
+    the estimated bytes those rows occupied; the space is reused by new rows
+    and returned to the OS only by VACUUM.
+    """
+    through = CartItem.variations.through
+    tables = (Cart, CartItem, through)
+    row_bytes = {model._meta.label: _average_row_bytes(model) for model in tables}
+
+    if dry_run:
+        carts = stale_carts(max_age_days)
+        rows = {
+            Cart._meta.label: carts.count(),
+            CartItem._meta.label: CartItem.objects.filter(cart__in=carts).count(),
+            through._meta.label: through.objects.filter(cartitem__cart__in=carts).count(),
+        }
+    else:
+        rows = dict.fromkeys(row_bytes, 0)
+        while True:
+            with transaction.atomic():
+                batch = stale_carts(max_age_days).order_by('id')
+                if connection.features.has_select_for_update_skip_locked:
+                    # Postgres: pass over carts another transaction holds (being touched or merged)
+                    # instead of waiting on them; SQLite serializes writers anyway
+                    batch = batch.select_for_update(skip_locked=True)
+                ids = list(batch.values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                _, deleted = stale_carts(max_age_days).filter(id__in=ids).delete()
+            for label, count in deleted.items():
+                rows[label] = rows.get(label, 0) + count
+            if len(ids) < batch_size:
+                break
+            if pause:
+                # Let other writers in between batches (matters most on SQLite)
+                time.sleep(pause)
+
+    # Empty tables have no size to measure, and nothing was deleted from them either
+    sizes = {label: size for label, size in row_bytes.items() if size}
+    reclaimed = int(sum(rows.get(label, 0) * size for label, size in sizes.items())) if sizes else None
+    return rows, reclaimed
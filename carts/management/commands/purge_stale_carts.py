@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from carts.maintenance import PURGE_BATCH_SIZE, STALE_AFTER_DAYS, purge_stale_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete anonymous carts (and their items) with no activity for a number of days, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=STALE_AFTER_DAYS, help='Idle days before a cart is stale')
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Carts deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        rows, reclaimed = purge_stale_carts(
+            max_age_days=options['days'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for label, count in rows.items():
+            self.stdout.write(f"{verb} {count} {label} rows.")
+        size = f"~{reclaimed / 1024:.1f} KiB" if reclaimed is not None else "an unknown amount"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {sum(rows.values())} rows from carts idle over {options['days']} days, {size} of table and index space."
+        ))
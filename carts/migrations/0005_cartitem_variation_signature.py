@@ -0,0 +1,61 @@
+# Generated by Django 5.0 on 2026-10-18 03:18
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _signature(variation_ids):
+    # Frozen copy of store.variants.variation_signature as of this migration
+    ids = sorted({int(pk) for pk in variation_ids})
+    if not ids:
+        return ''
+    return hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()
+
+
+def backfill_signatures(apps, schema_editor):
+    CartItem = apps.get_model('carts', 'CartItem')
+    selected = {}
+    for line_id, variation_id in CartItem.variations.through.objects.values_list('cartitem_id', 'variation_id'):
+        selected.setdefault(line_id, []).append(variation_id)
+
+    kept, duplicates = {}, []
+    for line in CartItem.objects.order_by('id'):
+        line.variation_signature = _signature(selected.get(line.id, ()))
+        owner = ('user', line.user_id) if line.user_id else ('cart', line.cart_id or f'orphan-{line.id}')
+        key = (owner, line.product_id, line.variation_signature)
+        if key in kept:
+            # Merge duplicate lines into the oldest one
+            kept[key].quantity += line.quantity
+            duplicates.append(line.id)
+        else:
+            kept[key] = line
+    CartItem.objects.filter(id__in=duplicates).delete()
+    CartItem.objects.bulk_update(kept.values(), ['variation_signature', 'quantity'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0004_cartitem_user_alter_cartitem_cart'),
+        ('store', '0025_wishlist_variation_signature'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='variation_signature',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'product', 'variation_signature'), name='cartitem_unique_user_line'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('cart__isnull', False)), fields=('cart', 'product', 'variation_signature'), name='cartitem_unique_cart_line'),
+        ),
+    ]
@@ -7,8 +7,10 @@ from store.models import Product, Variation
 # Cart
 # --------------------------
 class Cart(models.Model):
-    cart_id = models.CharField(max_length=250, blank=True)
+    cart_id = models.CharField(max_length=250, blank=True, db_index=True)
     date_added = models.DateField(auto_now_add=True)
+    # Set on creation and refreshed by carts.utils.touch_cart; purge_stale_carts keys off it
+    last_activity = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return self.cart_id
@@ -24,12 +26,30 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, null=True)
     quantity = models.IntegerField()
     is_active = models.BooleanField(default=True)
+    # store.variants.variation_signature() of `variations`; one line per owner, product and signature
+    variation_signature = models.CharField(max_length=40, blank=True, default='', editable=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'product', 'variation_signature'],
+                condition=models.Q(user__isnull=False),
+                name='cartitem_unique_user_line',
+            ),
+            models.UniqueConstraint(
+                fields=['cart', 'product', 'variation_signature'],
+                condition=models.Q(cart__isnull=False),
+                name='cartitem_unique_cart_line',
+            ),
+        ]
 
     def sub_total(self):
         """
-        Base price + modifiers from all selected variations * quantity
+        Base price + modifiers from all selected variations * quantity.
+        Lines priced by carts.pricing already carry it as line_total.
         """
+        if hasattr(self, 'line_total'):
+            return self.line_total
         base_price = self.product.price
         extra = sum(v.price_modifier for v in self.variations.all())
         return (base_price + extra) * self.quantity
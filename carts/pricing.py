@@ -0,0 +1,97 @@
+"""
+Cart pricing.
+
+CartPricing prices a whole cart in one query: each line is annotated in SQL
+with its unit price (product price + the sum of its variation modifiers) and
+line total, and the cart totals are summed from those rows. It is memoized on
+the request, so the cart and checkout views, the AJAX responses, the
+templates and the shipping quote all share one computation. Session-stored
+anonymous carts (carts.session_cart) are priced from their rows instead.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from store.models import Variation
+from .models import CartItem
+from .utils import _cart_id, session_cart, uses_session_cart
+
+TAX_RATE = Decimal("0.02")
+CENT = Decimal("0.01")
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def cart_items_for(request):
+    """Active cart lines of the current visitor (user cart or session cart)."""
+    if request.user.is_authenticated:
+        return CartItem.objects.filter(user=request.user, is_active=True)
+    return CartItem.objects.filter(cart__cart_id=_cart_id(request), is_active=True)
+
+
+def priced(cart_items):
+    """Annotate cart lines with modifier_total, unit_price and line_total."""
+    modifiers = (
+        CartItem.variations.through.objects.filter(cartitem_id=OuterRef('pk'))
+        .values('cartitem_id')
+        .annotate(total=Sum('variation__price_modifier'))
+        .values('total')
+    )
+    return cart_items.annotate(
+        modifier_total=Coalesce(Subquery(modifiers, output_field=MONEY), Value(Decimal("0")), output_field=MONEY),
+        unit_price=ExpressionWrapper(F('product__price') + F('modifier_total'), output_field=MONEY),
+        line_total=ExpressionWrapper(F('unit_price') * F('quantity'), output_field=MONEY),
+    )
+
+
+class CartPricing:
+    def __init__(self, lines):
+        # lines: priced CartItem rows (see priced()) or session cart lines
+        self.lines = lines
+        self.subtotal = Decimal("0.00")
+        self.quantity = 0
+        for line in self.lines:
+            line.unit_price = line.unit_price.quantize(CENT)
+            line.line_total = line.line_total.quantize(CENT)
+            self.subtotal += line.line_total
+            self.quantity += line.quantity
+        self.tax = (self.subtotal * TAX_RATE).quantize(CENT)
+        self.grand_total = (self.subtotal + self.tax).quantize(CENT)
+
+    @classmethod
+    def for_items(cls, cart_items):
+        return cls(list(
+            priced(cart_items)
+            .select_related('product__category')
+            .prefetch_related(Prefetch('variations', queryset=Variation.objects.select_related('category')))
+            .order_by('id')
+        ))
+
+    @classmethod
+    def for_request(cls, request, refresh=False):
+        """The current visitor's cart pricing, computed at most once per request unless refreshed."""
+        pricing = getattr(request, '_cart_pricing', None)
+        if pricing is None or refresh:
+            if uses_session_cart(request):
+                pricing = cls(session_cart(request).priced_lines())
+            else:
+                pricing = cls.for_items(cart_items_for(request))
+            request._cart_pricing = pricing
+        return pricing
+
+    def line(self, cart_item_id):
+        return next((line for line in self.lines if line.id == cart_item_id), None)
+
+    def line_for(self, product_id, signature):
+        return next(
+            (line for line in self.lines if line.product_id == product_id and line.variation_signature == signature),
+            None,
+        )
+
+    def as_json(self):
+        return {
+            "total": str(self.subtotal),
+            "tax": str(self.tax),
+            "grand_total": str(self.grand_total),
+            "total_cart_items": self.quantity,
+        }
@@ -0,0 +1,142 @@
+"""
+Quick order: add many parts to the cart from pasted "code, qty" lines or a CSV.
+
+Codes (manufacturer part numbers, GTIN/UPC/EAN in any format) are resolved
+with store.search.resolve_codes() in one indexed query. Stock is checked for
+all of them at once against the visitor's existing lines, and every accepted
+line is written in the caller's transaction. Unmatched codes, products that
+need options chosen, stock shortfalls and lines past a session
+cart's limit are reported, not added.
+"""
+import csv
+from collections import OrderedDict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from store.models import Product
+from store.search import resolve_codes
+from .models import CartItem
+from .session_cart import FULL_MESSAGE
+from .utils import add_to_line, anonymous_cart, free_cart_lines, line_snapshot, uses_session_cart
+
+MAX_LINES = 1000
+MAX_UPLOAD_BYTES = 1024 * 1024
+DELIMITERS = ('\t', ';', ',')
+
+
+def parse_lines(text, label='Line'):
+    """
+    One "code[,;<tab>]qty" per line (quantity defaults to 1; "#" starts a comment).
+    A first row whose quantity is not a number is taken as a CSV header.
+    Returns ([(line label, code, qty)], [error messages]).
+    """
+    entries, errors = [], []
+    for i, raw in enumerate((text or '').splitlines(), start=1):
+        number = f'{label} {i}'
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        delimiter = next((d for d in DELIMITERS if d in line), None)
+        if delimiter:
+            row = [cell.strip() for cell in next(csv.reader([line], delimiter=delimiter))]
+        else:
+            row = [line]
+        code = row[0]
+        quantity = row[1] if len(row) > 1 and row[1] else '1'
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            if not entries and not errors:
+                continue  # header row
+            errors.append(f"{number}: quantity '{quantity}' is not a whole number.")
+            continue
+        if not code:
+            errors.append(f"{number}: missing code.")
+        elif quantity < 1:
+            errors.append(f"{number}: quantity must be at least 1.")
+        else:
+            entries.append((number, code, quantity))
+        if len(entries) >= MAX_LINES:
+            errors.append(f"Only the first {MAX_LINES} lines were read.")
+            break
+    return entries, errors
+
+
+def add_entries(request, entries):
+    """
+    Resolve, validate and add parsed entries to the visitor's cart.
+    Call inside transaction.atomic(). Returns a result dict with `added`
+    [(product, qty)], `unmatched` [codes], `errors` [messages] and `units`.
+    """
+    result = {'added': [], 'unmatched': [], 'errors': [], 'units': 0}
+    resolved = resolve_codes(
+        [code for _, code, _ in entries],
+        queryset=Product.objects.filter(is_available=True).select_related('category'),
+    )
+
+    wanted = OrderedDict()  # product id -> [product, qty]
+    for number, code, quantity in entries:
+        product = resolved.get(code)
+        if product is None:
+            result['unmatched'].append(code)
+        elif product.has_variants:
+            result['errors'].append(f"{number}: {product.product_name} ({code}) has options; add it from its product page.")
+        else:
+            wanted.setdefault(product.id, [product, 0])[1] += quantity
+    if not wanted:
+        return result
+
+    # product id -> (line id, quantity) of the visitor's existing option-less lines
+    existing = {
+        product_id: (line_id, quantity)
+        for line_id, (product_id, signature, quantity) in line_snapshot(request, product_id__in=set(wanted)).items()
+        if signature == ''
+    }
+
+    accepted = []
+    free_lines = free_cart_lines(request)
+    for product_id, (product, quantity) in wanted.items():
+        in_cart = existing.get(product_id, (None, 0))[1]
+        if in_cart + quantity > product.stock:
+            result['errors'].append(
+                f"{product.product_name}: only {product.stock} in stock ({in_cart} already in your cart)."
+            )
+        elif product_id not in existing and free_lines == 0:
+            result['errors'].append(f"{product.product_name}: {FULL_MESSAGE}")
+        else:
+            if product_id not in existing and free_lines is not None:
+                free_lines -= 1
+            accepted.append((product, quantity))
+    if not accepted:
+        return result
+
+    result['added'] = accepted
+    result['units'] = sum(quantity for _, quantity in accepted)
+    if uses_session_cart(request):
+        for product, quantity in accepted:
+            add_to_line(request, product, [], quantity)
+        return result
+
+    if request.user.is_authenticated:
+        owner = {'user': request.user}
+    else:
+        owner = {'cart': anonymous_cart(request)}
+    new_lines = []
+    for product, quantity in accepted:
+        if product.id in existing:
+            CartItem.objects.filter(id=existing[product.id][0]).update(quantity=F('quantity') + quantity)
+        else:
+            new_lines.append(CartItem(product=product, quantity=quantity, variation_signature=''))
+    if new_lines:
+        for line in new_lines:
+            for field, value in owner.items():
+                setattr(line, field, value)
+        try:
+            with transaction.atomic():
+                CartItem.objects.bulk_create(new_lines)
+        except IntegrityError:
+            # A concurrent add created one of these lines: fall back to per-line upserts
+            for line in new_lines:
+                add_to_line(request, line.product, [], line.quantity)
+    return result
@@ -0,0 +1,134 @@
+"""
+Anonymous carts kept in the session.
+
+With CART_ANONYMOUS_STORAGE = 'session' a visitor who is not signed in gets
+no Cart/CartItem rows: their lines live in a compact session payload
+
+    request.session['cart'] = {'n': next line id, 'l': [[line id, product id, [variation ids], qty], ...]}
+
+and are written to the database only when they sign in (see
+carts.utils.migrate_cart_items); checkout requires an account, so that is
+also the point where a cart is materialized before checkout. Paired with the
+signed-cookie session engine, an anonymous cart costs no database writes at all.
+"""
+from decimal import Decimal
+
+from store.variants import variation_signature
+from store.models import Product, Variation
+
+SESSION_KEY = 'cart'
+MAX_LINES = 200
+FULL_MESSAGE = "Your cart is full; sign in to add more lines."
+
+
+class _VariationList(list):
+    """Quacks like the `variations` related manager for templates and callers."""
+
+    def all(self):
+        return self
+
+
+class SessionLine:
+    """A priced session cart line, exposing the attributes of a priced CartItem."""
+
+    def __init__(self, line_id, product, variations, quantity):
+        self.id = line_id
+        self.product = product
+        self.product_id = product.id
+        self.variations = _VariationList(variations)
+        self.variation_signature = variation_signature(v.id for v in variations)
+        self.quantity = quantity
+        self.is_active = True
+        self.modifier_total = sum((v.price_modifier for v in variations), Decimal("0"))
+        self.unit_price = product.price + self.modifier_total
+        self.line_total = self.unit_price * quantity
+
+    def sub_total(self):
+        return self.line_total
+
+
+class SessionCart:
+    def __init__(self, session):
+        self.session = session
+        data = session.get(SESSION_KEY) or {}
+        self.next_id = data.get('n', 1)
+        # [line id, product id, [variation ids], quantity]
+        self.rows = [[row[0], row[1], list(row[2]), row[3]] for row in data.get('l', [])]
+
+    def save(self):
+        if self.rows:
+            self.session[SESSION_KEY] = {'n': self.next_id, 'l': self.rows}
+        else:
+            self.session.pop(SESSION_KEY, None)
+        self.session.modified = True
+
+    def clear(self):
+        self.rows = []
+        self.save()
+
+    def count(self):
+        return sum(row[3] for row in self.rows)
+
+    def free_lines(self):
+        """How many more lines fit under MAX_LINES."""
+        return max(MAX_LINES - len(self.rows), 0)
+
+    def snapshot(self):
+        """{line id: (product id, signature, quantity)}, like the database lines."""
+        return {row[0]: (row[1], variation_signature(row[2]), row[3]) for row in self.rows}
+
+    def _row(self, line_id):
+        return next((row for row in self.rows if row[0] == line_id), None)
+
+    def add(self, product_id, variation_ids, quantity):
+        signature = variation_signature(variation_ids)
+        for row in self.rows:
+            if row[1] == product_id and variation_signature(row[2]) == signature:
+                row[3] += quantity
+                break
+        else:
+            if len(self.rows) >= MAX_LINES:
+                raise ValueError(FULL_MESSAGE)
+            self.rows.append([self.next_id, product_id, sorted(set(variation_ids)), quantity])
+            self.next_id += 1
+        self.save()
+        return signature
+
+    def set(self, line_id, quantity):
+        row = self._row(line_id)
+        if row is None:
+            return
+        if quantity > 0:
+            row[3] = quantity
+        else:
+            self.rows.remove(row)
+        self.save()
+
+    def remove(self, line_id, product_id, quantity=None):
+        """Take `quantity` (default: all) off a line. Returns how many units were removed."""
+        row = self._row(line_id)
+        if row is None or row[1] != product_id:
+            return 0
+        if quantity is not None and row[3] > quantity:
+            row[3] -= quantity
+            self.save()
+            return quantity
+        self.rows.remove(row)
+        self.save()
+        return row[3]
+
+    def priced_lines(self):
+        """SessionLine objects for the rows, from one product and one variation query."""
+        if not self.rows:
+            return []
+        products = Product.objects.select_related('category').in_bulk({row[1] for row in self.rows})
+        variation_ids = {pk for row in self.rows for pk in row[2]}
+        variations = Variation.objects.select_related('category').in_bulk(variation_ids) if variation_ids else {}
+        lines = []
+        for line_id, product_id, ids, quantity in self.rows:
+            product = products.get(product_id)
+            if product is None:
+                continue  # product deleted since it was added
+            chosen = [variations[pk] for pk in ids if pk in variations]
+            lines.append(SessionLine(line_id, product, chosen, quantity))
+        return lines
@@ -1,3 +1,459 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Account
+from category.models import Category
+from store.models import Product, Variation, VariationCategory
+from store.variants import variation_signature
+from . import quick_order, session_cart
+from .maintenance import purge_stale_carts, stale_carts
+from .pricing import CartPricing
+from .models import Cart, CartItem
+from .utils import add_to_line, cart_count, migrate_cart_items, remove_from_line
+
+
+class CartTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.regulator = Product.objects.create(
+            product_name='Oxygen Regulator', slug='oxygen-regulator', price=100, stock=20,
+            category=category, images='photos/products/regulator.jpg', has_variants=True,
+        )
+        cls.hose = Product.objects.create(
+            product_name='Twin Hose', slug='twin-hose', price=25, stock=10,
+            category=category, images='photos/products/hose.jpg',
+        )
+        cls.torch = Product.objects.create(
+            product_name='Cutting Torch', slug='cutting-torch', price=60, stock=5,
+            category=category, images='photos/products/torch.jpg',
+        )
+        gas = VariationCategory.objects.create(name='Gas Type')
+        size = VariationCategory.objects.create(name='Size')
+        cls.oxygen = Variation.objects.create(product=cls.regulator, category=gas, name='Oxygen')
+        cls.large = Variation.objects.create(product=cls.regulator, category=size, name='Large', price_modifier=10)
+        cls.user = Account.objects.create_user(
+            first_name='Test', last_name='User', username='tester', email='tester@example.com', password='secret',
+        )
+        cls.user.is_active = True
+        cls.user.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, user=None, session=None):
+        request = RequestFactory().post('/')
+        request.user = user or AnonymousUser()
+        request.session = session or import_module(settings.SESSION_ENGINE).SessionStore()
+        return request
+
+
+class CartLineTests(CartTestCase):
+    def test_adds_with_same_variations_share_one_line(self):
+        request = self.request(self.user)
+        first = add_to_line(request, self.regulator, [self.oxygen.id, self.large.id], 2)
+        second = add_to_line(request, self.regulator, [self.large.id, self.oxygen.id], 3)
+        self.assertEqual(first, second)
+        line = CartItem.objects.get(user=self.user)
+        self.assertEqual(line.quantity, 5)
+        self.assertEqual(set(line.variations.all()), {self.oxygen, self.large})
+
+    def test_insert_race_falls_back_to_update(self):
+        request = self.request(self.user)
+        add_to_line(request, self.hose, [], 1)
+        real_update = QuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            # The first UPDATE misses, as if a concurrent request inserted the line right after it
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update):
+            add_to_line(request, self.hose, [], 2)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(CartItem.objects.get(user=self.user).quantity, 3)
+
+    def test_remove_takes_units_then_deletes_line(self):
+        request = self.request(self.user)
+        add_to_line(request, self.hose, [], 2)
+        line = CartItem.objects.get(user=self.user)
+        self.assertEqual(remove_from_line(request, self.hose.id, line.id, quantity=1), 1)
+        self.assertEqual(remove_from_line(request, self.hose.id, line.id, quantity=1), 1)
+        self.assertFalse(CartItem.objects.exists())
+
+
+    def test_remove_keeps_units_added_before_the_delete(self):
+        request = self.request(self.user)
+        add_to_line(request, self.hose, [], 1)
+        line = CartItem.objects.get(user=self.user)
+        real_delete = QuerySet.delete
+        calls = []
+
+        def delete(queryset):
+            # A concurrent add lands between reading the last unit and deleting the line
+            if not calls:
+                CartItem.objects.filter(id=line.id).update(quantity=F('quantity') + 2)
+            calls.append(queryset)
+            return real_delete(queryset)
+
+        with mock.patch.object(QuerySet, 'delete', delete):
+            self.assertEqual(remove_from_line(request, self.hose.id, line.id, quantity=1), 1)
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 2)
+
+class BatchUpdateTests(CartTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        add_to_line(self.request(self.user), self.hose, [], 2)
+        self.line = CartItem.objects.get(user=self.user)
+
+    def post(self, operations):
+        return self.client.post('/cart/update/', json.dumps({'operations': operations}), content_type='application/json')
+
+    def test_invalid_operation_rejects_whole_batch(self):
+        response = self.post([
+            {'line': self.line.id, 'quantity': 4},
+            {'line': 999999, 'delta': 1},
+            {'product': self.hose.id, 'delta': 50},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 2)
+        self.line.refresh_from_db()
+        self.assertEqual(self.line.quantity, 2)
+
+    def test_valid_batch_applies_every_operation(self):
+        response = self.post([
+            {'line': self.line.id, 'delta': 1},
+            {'product': self.regulator.id, 'variations': [self.oxygen.id, self.large.id], 'quantity': 2},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_cart_items'], 5)
+        self.assertEqual(
+            sorted(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity')),
+            sorted([(self.hose.id, 3), (self.regulator.id, 2)]),
+        )
+
+
+class LoginMergeTests(CartTestCase):
+    @override_settings(CART_ANONYMOUS_STORAGE='db')
+    def test_database_cart_merges_into_existing_user_line(self):
+        add_to_line(self.request(self.user), self.regulator, [self.oxygen.id], 1)
+        request = self.request()
+        add_to_line(request, self.regulator, [self.oxygen.id], 2)
+        add_to_line(request, self.hose, [], 1)
+
+        migrate_cart_items(request, self.user)
+        lines = {line.product_id: line for line in CartItem.objects.all()}
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[self.regulator.id].quantity, 3)
+        self.assertEqual(lines[self.hose.id].user, self.user)
+        self.assertTrue(all(line.cart_id is None for line in lines.values()))
+        self.assertFalse(Cart.objects.exists())
+
+    @override_settings(CART_ANONYMOUS_STORAGE='session')
+    def test_session_cart_is_materialized_at_login(self):
+        add_to_line(self.request(self.user), self.hose, [], 1)
+        request = self.request()
+        add_to_line(request, self.hose, [], 2)
+        add_to_line(request, self.regulator, [self.large.id, self.oxygen.id], 1)
+        self.assertFalse(CartItem.objects.filter(user=None).exists())
+
+        migrate_cart_items(request, self.user)
+        lines = {line.product_id: line for line in CartItem.objects.filter(user=self.user)}
+        self.assertEqual(lines[self.hose.id].quantity, 3)
+        self.assertEqual(set(lines[self.regulator.id].variations.all()), {self.oxygen, self.large})
+        self.assertNotIn(session_cart.SESSION_KEY, request.session)
+        self.assertFalse(Cart.objects.exists())
+
+
+@override_settings(CART_ANONYMOUS_STORAGE='session')
+class SessionCartTests(CartTestCase):
+    def test_line_cap(self):
+        request = self.request()
+        with mock.patch.object(session_cart, 'MAX_LINES', 1):
+            add_to_line(request, self.hose, [], 1)
+            # Adding to an existing line is still allowed at the cap
+            add_to_line(request, self.hose, [], 1)
+            with self.assertRaises(ValueError):
+                add_to_line(request, self.regulator, [self.oxygen.id, self.large.id], 1)
+        self.assertEqual(request.session[session_cart.SESSION_KEY]['l'], [[1, self.hose.id, [], 2]])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_full_cart_is_a_client_error(self):
+        with mock.patch.object(session_cart, 'MAX_LINES', 1):
+            self.client.post(f'/cart/add_cart/{self.hose.id}/', {'quantity': 1})
+            response = self.client.post(
+                f'/cart/add_cart/{self.regulator.id}/', {'quantity': 1, 'Gas Type': 'oxygen', 'Size': 'large'},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('full', response.json()['message'])
+        self.assertEqual(self.client.session[session_cart.SESSION_KEY]['l'], [[1, self.hose.id, [], 1]])
+
+    def test_quick_order_reports_lines_past_the_cap(self):
+        for product, code in ((self.hose, 'TH-100'), (self.torch, 'CT-200')):
+            product.manufacturer_part_number = code
+            product.save()
+        with mock.patch.object(session_cart, 'MAX_LINES', 1):
+            self.client.post(f'/cart/add_cart/{self.hose.id}/', {'quantity': 1})
+            response = self.client.post(
+                '/cart/quick-order/', {'lines': 'TH-100, 2\nCT-200, 1'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([line['product_id'] for line in data['added']], [self.hose.id])
+        self.assertEqual(data['errors'], [f'Cutting Torch: {session_cart.FULL_MESSAGE}'])
+        self.assertEqual(self.client.session[session_cart.SESSION_KEY]['l'], [[1, self.hose.id, [], 3]])
+
+    def test_batch_update_past_the_cap_is_rejected(self):
+        with mock.patch.object(session_cart, 'MAX_LINES', 1):
+            self.client.post(f'/cart/add_cart/{self.hose.id}/', {'quantity': 1})
+            response = self.client.post(
+                '/cart/update/', json.dumps({'operations': [{'product': self.torch.id, 'quantity': 1}]}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['errors'], [session_cart.FULL_MESSAGE])
+            self.assertEqual(self.client.session[session_cart.SESSION_KEY]['l'], [[1, self.hose.id, [], 1]])
+
+            # Emptying a line in the same batch makes room
+            response = self.client.post(
+                '/cart/update/',
+                json.dumps({'operations': [{'product': self.torch.id, 'quantity': 1}, {'line': 1, 'quantity': 0}]}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session[session_cart.SESSION_KEY]['l'], [[2, self.torch.id, [], 1]])
+
+
+class CartCountTests(CartTestCase):
+    def test_count_is_cached_and_adjusted_by_the_cart_views(self):
+        self.client.force_login(self.user)
+        request = self.request(self.user)
+        self.client.post(f'/cart/add_cart/{self.hose.id}/', {'quantity': 2})
+        self.assertEqual(cart_count(request), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(cart_count(request), 2)
+
+        self.client.post(f'/cart/add_cart/{self.hose.id}/', {'quantity': 3})
+        line = CartItem.objects.get(user=self.user)
+        self.client.post(f'/cart/remove_cart/{self.hose.id}/{line.id}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(cart_count(request), 4)
+        self.client.post(f'/cart/remove_cart_item/{self.hose.id}/{line.id}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(cart_count(request), 0)
+
+    @override_settings(CART_ANONYMOUS_STORAGE='db')
+    def test_login_merge_drops_both_cached_counts(self):
+        user_request = self.request(self.user)
+        add_to_line(user_request, self.hose, [], 1)
+        self.assertEqual(cart_count(user_request), 1)
+        request = self.request()
+        add_to_line(request, self.hose, [], 2)
+        self.assertEqual(cart_count(request), 2)
+
+        migrate_cart_items(request, self.user)
+        self.assertEqual(cart_count(user_request), 3)
+        self.assertEqual(cart_count(request), 0)
+
+    @override_settings(CART_ANONYMOUS_STORAGE='db')
+    def test_anonymous_visitor_without_a_cart_costs_nothing(self):
+        request = self.request()
+        with self.assertNumQueries(0):
+            self.assertEqual(cart_count(request), 0)
+        self.assertNotIn('cart_id', request.session)
+
+
+class CartLineConstraintTests(CartTestCase):
+    def line(self, signature, **owner):
+        with transaction.atomic():
+            return CartItem.objects.create(product=self.regulator, quantity=1, variation_signature=signature, **owner)
+
+    def test_one_line_per_owner_product_and_signature(self):
+        signature = variation_signature([self.oxygen.id, self.large.id])
+        cart = Cart.objects.create(cart_id='session-cart')
+        self.line(signature, user=self.user)
+        self.line(signature, cart=cart)
+        self.line(variation_signature([self.oxygen.id]), user=self.user)
+        self.line('', user=self.user)
+        for owner in ({'user': self.user}, {'cart': cart}):
+            with self.assertRaises(IntegrityError):
+                self.line(variation_signature([self.large.id, self.oxygen.id]), **owner)
+        self.assertEqual(CartItem.objects.count(), 4)
+
+
+class CartPricingTests(CartTestCase):
+    def fill(self, request):
+        add_to_line(request, self.regulator, [self.oxygen.id, self.large.id], 2)
+        add_to_line(request, self.regulator, [self.oxygen.id], 1)
+        add_to_line(request, self.hose, [], 3)
+
+    def assert_totals(self, pricing):
+        self.assertEqual(
+            sorted((line.product_id, line.quantity, line.unit_price, line.line_total) for line in pricing.lines),
+            sorted([
+                (self.regulator.id, 2, Decimal('110.00'), Decimal('220.00')),
+                (self.regulator.id, 1, Decimal('100.00'), Decimal('100.00')),
+                (self.hose.id, 3, Decimal('25.00'), Decimal('75.00')),
+            ]),
+        )
+        self.assertEqual(
+            (pricing.subtotal, pricing.tax, pricing.grand_total, pricing.quantity),
+            (Decimal('395.00'), Decimal('7.90'), Decimal('402.90'), 6),
+        )
+
+    def test_database_cart_is_priced_in_fixed_queries(self):
+        request = self.request(self.user)
+        self.fill(request)
+        with self.assertNumQueries(2):
+            pricing = CartPricing.for_request(request)
+            line = pricing.line_for(self.regulator.id, variation_signature([self.oxygen.id, self.large.id]))
+            self.assertEqual([str(v.category) for v in line.variations.all()], ['Gas Type', 'Size'])
+        self.assert_totals(pricing)
+        with self.assertNumQueries(0):
+            self.assertIs(CartPricing.for_request(request), pricing)
+
+    @override_settings(CART_ANONYMOUS_STORAGE='session')
+    def test_session_cart_is_priced_the_same(self):
+        request = self.request()
+        self.fill(request)
+        self.assert_totals(CartPricing.for_request(request))
+
+
+class QuickOrderParseTests(SimpleTestCase):
+    def test_delimiters_defaults_comments_and_header(self):
+        entries, errors = quick_order.parse_lines(
+            'code,qty\nBD-16240, 2\n# comment\n\nTH-100\tx3\nCT-200;\n012345678905;4\n,5\nTH-9, 0'
+        )
+        self.assertEqual(entries, [('Line 2', 'BD-16240', 2), ('Line 6', 'CT-200', 1), ('Line 7', '012345678905', 4)])
+        self.assertEqual(errors, [
+            "Line 5: quantity 'x3' is not a whole number.",
+            'Line 8: missing code.',
+            'Line 9: quantity must be at least 1.',
+        ])
+
+    def test_only_a_first_row_is_taken_as_header(self):
+        entries, errors = quick_order.parse_lines('A-1, 1\nB-2, many', label='File line')
+        self.assertEqual(entries, [('File line 1', 'A-1', 1)])
+        self.assertEqual(errors, ["File line 2: quantity 'many' is not a whole number."])
+
+    def test_line_limit(self):
+        with mock.patch.object(quick_order, 'MAX_LINES', 2):
+            entries, errors = quick_order.parse_lines('A\nB\nC')
+        self.assertEqual([code for _, code, _ in entries], ['A', 'B'])
+        self.assertEqual(errors, ['Only the first 2 lines were read.'])
+
+
+class QuickOrderTests(CartTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for product, fields in (
+            (cls.hose, {'manufacturer_part_number': 'TH-100', 'upc_ean': '012345678905'}),
+            (cls.torch, {'manufacturer_part_number': 'CT-200'}),
+            (cls.regulator, {'manufacturer_part_number': 'OR-300'}),
+        ):
+            for field, value in fields.items():
+                setattr(product, field, value)
+            product.save()
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def post(self, lines):
+        return self.client.post('/cart/quick-order/', {'lines': lines}, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+    def test_codes_resolve_in_any_format_and_merge(self):
+        add_to_line(self.request(self.user), self.hose, [], 1)
+        data = self.post('th 100, 2\n12345678905, 1\nct200, 4')
+        self.assertEqual(
+            [(line['product_id'], line['quantity']) for line in data['added']], [(self.hose.id, 3), (self.torch.id, 4)],
+        )
+        self.assertEqual((data['unmatched'], data['errors'], data['total_cart_items']), ([], [], 8))
+        self.assertEqual(
+            sorted(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity')),
+            sorted([(self.hose.id, 4), (self.torch.id, 4)]),
+        )
+
+    def test_unresolvable_entries_are_reported_not_added(self):
+        add_to_line(self.request(self.user), self.torch, [], 3)
+        data = self.post('NOPE-1\nOR-300, 1\nCT-200, 3\nTH-100, x\nTH-100, 1')
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual([line['product_id'] for line in data['added']], [self.hose.id])
+        self.assertEqual(data['unmatched'], ['NOPE-1'])
+        self.assertEqual(data['errors'], [
+            "Line 4: quantity 'x' is not a whole number.",
+            'Line 2: Oxygen Regulator (OR-300) has options; add it from its product page.',
+            'Cutting Torch: only 5 in stock (3 already in your cart).',
+        ])
+        self.assertEqual(CartItem.objects.get(user=self.user, product=self.torch).quantity, 3)
+
+    def test_nothing_added_is_an_error(self):
+        data = self.post('NOPE-1')
+        self.assertEqual((data['status'], data['added'], data['unmatched']), ('error', [], ['NOPE-1']))
+        self.assertFalse(CartItem.objects.exists())
+
+
+class PurgeStaleCartsTests(CartTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        cls.stale, cls.fresh = [], []
+        for i, (last_activity, date_added, is_stale) in enumerate((
+            (now - timedelta(days=40), None, True),
+            (now - timedelta(days=31), None, True),
+            (now - timedelta(days=60), None, True),
+            (None, (now - timedelta(days=45)).date(), True),
+            (now - timedelta(days=29), None, False),
+            (None, now.date(), False),
+            # Touched recently even though created long ago
+            (now - timedelta(days=1), (now - timedelta(days=90)).date(), False),
+        )):
+            cart = Cart.objects.create(cart_id=f'cart-{i}', last_activity=last_activity)
+            if date_added:
+                Cart.objects.filter(pk=cart.pk).update(date_added=date_added)
+            line = CartItem.objects.create(cart=cart, product=cls.regulator, quantity=1)
+            line.variations.set([cls.oxygen, cls.large])
+            (cls.stale if is_stale else cls.fresh).append(cart.pk)
+
+    def test_stale_carts_go_by_last_activity_then_date_added(self):
+        self.assertEqual(set(stale_carts(30).values_list('pk', flat=True)), set(self.stale))
+
+    def test_purge_deletes_stale_carts_in_batches(self):
+        with mock.patch('carts.maintenance.time.sleep') as sleep:
+            rows, _ = purge_stale_carts(max_age_days=30, batch_size=3, pause=0.5)
+        self.assertEqual(rows, {'carts.Cart': 4, 'carts.CartItem': 4, 'carts.CartItem_variations': 8})
+        # One pause after the full batch of 3, none after the last partial one
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), set(self.fresh))
+        self.assertEqual(CartItem.objects.count(), 3)
+
+    def test_dry_run_only_counts(self):
+        rows, _ = purge_stale_carts(max_age_days=30, dry_run=True)
+        self.assertEqual(rows, {'carts.Cart': 4, 'carts.CartItem': 4, 'carts.CartItem_variations': 8})
+        self.assertEqual(Cart.objects.count(), 7)
+
+    def test_command_reports_the_deleted_rows(self):
+        out = StringIO()
+        call_command('purge_stale_carts', days=50, batch_size=1, stdout=out)
+        self.assertIn('Deleted 1 carts.Cart rows.', out.getvalue())
+        self.assertIn('Deleted 4 rows from carts idle over 50 days', out.getvalue())
+        self.assertEqual(Cart.objects.count(), 6)
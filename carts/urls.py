@@ -6,6 +6,8 @@ urlpatterns = [
     path('add_cart/<int:product_id>/', views.add_cart, name='add_cart'),
     path('remove_cart/<int:product_id>/<int:cart_item_id>/', views.remove_cart, name='remove_cart'),
     path('remove_cart_item/<int:product_id>/<int:cart_item_id>/', views.remove_cart_item, name='remove_cart_item'),
+    path('update/', views.update_cart, name='update_cart'),
+    path('quick-order/', views.quick_order, name='quick_order'),
 
     path('checkout/', views.checkout, name='checkout'),
 ]
@@ -1,7 +1,20 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from store.variants import variation_signature
+from store.models import Product, Variation
 from .models import Cart, CartItem
+from .session_cart import SessionCart
+from datetime import timedelta
 import uuid
 
+CART_COUNT_TIMEOUT = getattr(settings, 'CART_COUNT_CACHE_TIMEOUT', 60 * 15)
+# Cart.last_activity only needs day-level precision for purge_stale_carts
+CART_TOUCH_INTERVAL = timedelta(hours=1)
+
 
 def _cart_id(request):
     cart_id = request.session.get('cart_id')
@@ -12,31 +25,282 @@ def _cart_id(request):
     return cart_id
 
 
-def migrate_cart_items(request, user):
+def uses_session_cart(request):
+    """True when the visitor's cart lives in the session rather than in Cart/CartItem rows."""
+    return getattr(settings, 'CART_ANONYMOUS_STORAGE', 'db') == 'session' and not request.user.is_authenticated
+
+
+def session_cart(request):
+    if not hasattr(request, '_session_cart'):
+        request._session_cart = SessionCart(request.session)
+    return request._session_cart
+
+
+def free_cart_lines(request):
+    """How many new lines the visitor's cart can take, or None when there is no limit (database carts)."""
+    if uses_session_cart(request):
+        return session_cart(request).free_lines()
+    return None
+
+
+def touch_cart(cart_id):
+    """Record activity on an anonymous Cart row; a no-op UPDATE unless the stamp is over CART_TOUCH_INTERVAL old."""
+    now = timezone.now()
+    Cart.objects.filter(cart_id=cart_id).exclude(
+        last_activity__gte=now - CART_TOUCH_INTERVAL,
+    ).update(last_activity=now)
+
+
+def anonymous_cart(request):
+    """The visitor's Cart row, created on first use. Either way it counts as activity."""
+    cart, created = Cart.objects.get_or_create(cart_id=_cart_id(request), defaults={'last_activity': timezone.now()})
+    if not created:
+        touch_cart(cart.cart_id)
+    return cart
+
+
+# --------------------------
+# Cart badge count
+# --------------------------
+# The navbar item count is cached per owner (user or session cart) and adjusted
+# in place by the cart views; a missing key is recomputed with one SUM query.
+def _count_key(user=None, cart_id=None):
+    if user is not None:
+        return f'carts:count:user:{user.pk}'
+    return f'carts:count:cart:{cart_id}'
+
+
+def _request_count_key(request):
+    if request.user.is_authenticated:
+        return _count_key(user=request.user)
+    if uses_session_cart(request):
+        return None
+    cart_id = request.session.get('cart_id')
+    return _count_key(cart_id=cart_id) if cart_id else None
+
+
+def cart_count(request):
+    if uses_session_cart(request):
+        return session_cart(request).count()
+    key = _request_count_key(request)
+    if key is None:
+        # No session cart yet: nothing to count, and no session write just to render the navbar
+        return 0
+    count = cache.get(key)
+    if count is None:
+        if request.user.is_authenticated:
+            cart_items = CartItem.objects.filter(user=request.user)
+        else:
+            cart_items = CartItem.objects.filter(cart__cart_id=request.session['cart_id'])
+        count = cart_items.aggregate(total=Sum('quantity'))['total'] or 0
+        cache.set(key, count, CART_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_cart_count(request, delta):
+    key = _request_count_key(request)
+    if key is None or not delta:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Not cached: the next render recomputes it
+        pass
+
+
+def forget_cart_count(user=None, cart_id=None):
+    keys = []
+    if user is not None:
+        keys.append(_count_key(user=user))
+    if cart_id:
+        keys.append(_count_key(cart_id=cart_id))
+    cache.delete_many(keys)
+
+
+# --------------------------
+# Line mutations
+# --------------------------
+# Quantities change through single UPDATE ... SET quantity = quantity +/- n
+# statements, so concurrent clicks on the same line cannot lose updates.
+# Callers wrap them in transaction.atomic() together with the CartPricing
+# they return to the client.
+def _owner_filter(request):
+    if request.user.is_authenticated:
+        return {'user': request.user}
+    return {'cart__cart_id': _cart_id(request)}
+
+
+def add_to_line(request, product, variation_ids, quantity):
+    """
+    Add `quantity` to the visitor's line for `product` with `variation_ids`,
+    inserting the line when there is none. Returns the line's signature.
+    """
+    if uses_session_cart(request):
+        return session_cart(request).add(product.id, variation_ids, quantity)
+    signature = variation_signature(variation_ids)
+    lines = CartItem.objects.filter(product=product, variation_signature=signature, **_owner_filter(request))
+    if lines.update(quantity=F('quantity') + quantity):
+        if not request.user.is_authenticated:
+            touch_cart(_cart_id(request))
+        return signature
+
+    if request.user.is_authenticated:
+        owner = {'user': request.user}
+    else:
+        owner = {'cart': anonymous_cart(request)}
     try:
-        session_cart_id = _cart_id(request)
-        session_cart = Cart.objects.get(cart_id=session_cart_id)
-        session_cart_items = CartItem.objects.filter(cart=session_cart)
-        user_cart_items = CartItem.objects.filter(user=user)
-
-        for session_item in session_cart_items:
-            existing_user_item = None
-            for user_item in user_cart_items:
-                if user_item.product == session_item.product and \
-                        set(user_item.variations.all()) == set(session_item.variations.all()):
-                    existing_user_item = user_item
-                    break
-            if existing_user_item:
-                existing_user_item.quantity += session_item.quantity
-                existing_user_item.save()
-                session_item.delete()
+        with transaction.atomic():
+            line = CartItem.objects.create(product=product, quantity=quantity, variation_signature=signature, **owner)
+            if variation_ids:
+                line.variations.set(variation_ids)
+    except IntegrityError:
+        # A concurrent request inserted the same line first (unique per owner/product/signature)
+        lines.update(quantity=F('quantity') + quantity)
+    return signature
+
+
+def remove_from_line(request, product_id, cart_item_id, quantity=None):
+    """
+    Take `quantity` (default: all) off one of the visitor's lines, deleting the
+    line when nothing would be left. Returns how many units were removed.
+    """
+    if uses_session_cart(request):
+        return session_cart(request).remove(cart_item_id, product_id, quantity)
+    lines = CartItem.objects.filter(id=cart_item_id, product_id=product_id, **_owner_filter(request))
+    while True:
+        if quantity is not None and lines.filter(quantity__gt=quantity).update(quantity=F('quantity') - quantity):
+            return quantity
+        remaining = lines.values_list('quantity', flat=True).first()
+        if remaining is None:
+            return 0
+        # Delete only if the line still holds what was read; if an add landed in between, start over
+        if lines.filter(quantity=remaining).delete()[0]:
+            return remaining
+
+
+def line_snapshot(request, **filters):
+    """
+    {line id: (product id, variation signature, quantity)} for the visitor's
+    lines (optionally filtered, e.g. product_id__in=...), locked for update.
+    """
+    if uses_session_cart(request):
+        snapshot = session_cart(request).snapshot()
+        product_ids = filters.get('product_id__in')
+        if product_ids is not None:
+            snapshot = {k: v for k, v in snapshot.items() if v[0] in product_ids}
+        return snapshot
+    return {
+        line_id: (product_id, signature, quantity)
+        for line_id, product_id, signature, quantity in CartItem.objects
+        .filter(**_owner_filter(request), **filters)
+        .select_for_update()
+        .values_list('id', 'product_id', 'variation_signature', 'quantity')
+    }
+
+
+def set_line_quantity(request, cart_item_id, quantity):
+    """Set one line's quantity; 0 deletes it."""
+    if uses_session_cart(request):
+        session_cart(request).set(cart_item_id, quantity)
+    elif quantity > 0:
+        CartItem.objects.filter(id=cart_item_id, **_owner_filter(request)).update(quantity=quantity)
+    else:
+        CartItem.objects.filter(id=cart_item_id, **_owner_filter(request)).delete()
+
+
+def _materialize_session_cart(request, user):
+    """
+    Write a session cart's lines into the user's cart: merged into existing
+    lines with one bulk update, the rest bulk-inserted with their variations.
+    """
+    cart = SessionCart(request.session)
+    if not cart.rows:
+        return
+    product_ids = set(Product.objects.filter(id__in={row[1] for row in cart.rows}).values_list('id', flat=True))
+    variation_ids = set(
+        Variation.objects.filter(id__in={pk for row in cart.rows for pk in row[2]}, product_id__in=product_ids)
+        .values_list('id', flat=True)
+    )
+    incoming = {}  # (product id, signature) -> [quantity, variation ids]
+    for _, product_id, ids, quantity in cart.rows:
+        if product_id not in product_ids:
+            continue
+        ids = [pk for pk in ids if pk in variation_ids]
+        incoming.setdefault((product_id, variation_signature(ids)), [0, ids])[0] += quantity
+
+    user_lines = {
+        (product_id, signature): [line_id, quantity]
+        for line_id, product_id, signature, quantity in CartItem.objects
+        .filter(user=user, product_id__in=product_ids)
+        .select_for_update()
+        .values_list('id', 'product_id', 'variation_signature', 'quantity')
+    }
+    updated, new_lines = [], []
+    for (product_id, signature), (quantity, ids) in incoming.items():
+        if (product_id, signature) in user_lines:
+            line_id, current = user_lines[(product_id, signature)]
+            updated.append(CartItem(id=line_id, quantity=current + quantity))
+        else:
+            new_lines.append((CartItem(user=user, product_id=product_id, quantity=quantity, variation_signature=signature), ids))
+    if updated:
+        CartItem.objects.bulk_update(updated, ['quantity'])
+    if new_lines:
+        CartItem.objects.bulk_create([line for line, _ in new_lines])
+        CartItem.variations.through.objects.bulk_create([
+            CartItem.variations.through(cartitem_id=line.id, variation_id=pk)
+            for line, ids in new_lines for pk in ids
+        ])
+    cart.clear()
+
+
+def _merge_database_cart(session_cart_id, user):
+    """
+    Merge a database session cart: lines whose (product, variation signature)
+    the user already has are added to those lines with one bulk update and then
+    deleted; the rest are re-owned with one UPDATE (their variations stay
+    attached); then the Cart row is deleted.
+    """
+    session_lines = list(
+        CartItem.objects.filter(cart__cart_id=session_cart_id)
+        .values_list('id', 'product_id', 'variation_signature', 'quantity')
+    )
+    if session_lines:
+        user_lines = {
+            (product_id, signature): [line_id, quantity]
+            for line_id, product_id, signature, quantity in CartItem.objects
+            .filter(user=user, product_id__in={line[1] for line in session_lines})
+            .select_for_update()
+            .values_list('id', 'product_id', 'variation_signature', 'quantity')
+        }
+        merged, moved, updated = [], [], {}
+        for line_id, product_id, signature, quantity in session_lines:
+            target = user_lines.get((product_id, signature))
+            if target:
+                target[1] += quantity
+                updated[target[0]] = target[1]
+                merged.append(line_id)
             else:
-                session_item.user = user
-                session_item.cart = None
-                session_item.save()
+                moved.append(line_id)
+        if merged:
+            CartItem.objects.bulk_update(
+                [CartItem(id=line_id, quantity=quantity) for line_id, quantity in updated.items()],
+                ['quantity'],
+            )
+            CartItem.objects.filter(id__in=merged).delete()
+        if moved:
+            CartItem.objects.filter(id__in=moved).update(user=user, cart=None)
+    Cart.objects.filter(cart_id=session_cart_id).delete()
 
-        session_cart.delete()
-    except Cart.DoesNotExist:
-        pass
-    except Exception:
-        pass
\ No newline at end of file
+
+def migrate_cart_items(request, user):
+    """
+    Merge the anonymous cart into the user's cart at login, in one transaction
+    and a fixed number of queries whatever the cart sizes: lines kept in the
+    session are materialized, and a database session cart is merged.
+    """
+    session_cart_id = request.session.get('cart_id')
+    with transaction.atomic():
+        _materialize_session_cart(request, user)
+        if session_cart_id:
+            _merge_database_cart(session_cart_id, user)
+    forget_cart_count(user=user, cart_id=session_cart_id)
@@ -1,35 +1,22 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import render, redirect, get_object_or_404
-from orders.shipping.easypost_client import create_shipment_from_order
 from accounts.models import UserProfile
-from store.models import Product, Variation, VariationCategory, Wishlist
-from .models import CartItem, Cart
+from store.catalog import get_variant_matrix
+from store.variants import variation_signature
+from store.models import Product, Wishlist
 from django.contrib.auth.decorators import login_required
-from carts.utils import _cart_id
+from carts.utils import add_to_line, adjust_cart_count, free_cart_lines, line_snapshot, remove_from_line, set_line_quantity
+from carts.pricing import CartPricing
+from carts.session_cart import FULL_MESSAGE
+from carts import quick_order as quick_order_service
+from django.db import transaction
 from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from decimal import Decimal
+import json
 from orders.models import SiteSettings
 from orders.forms import OrderForm
-from orders.shipping.easypost_client import create_shipment_from_order   # 🆕 EasyPost helper
-# --------------------------
-# Helpers
-# --------------------------
-def _calculate_cart_totals(cart_items):
-    """
-    Calculate totals using CartItem.sub_total() so variation price modifiers are included.
-    """
-    total = Decimal("0.00")
-    quantity = 0
-    for cart_item in cart_items:
-        total += Decimal(cart_item.sub_total())
-        quantity += cart_item.quantity
-    tax = (Decimal("2") * total) / Decimal("100")
-    tax = tax.quantize(Decimal("0.01"))
-    grand_total = (total + tax).quantize(Decimal("0.01"))
-    return total, tax, grand_total, quantity
-
-
 # --------------------------
 # Cart operations
 # --------------------------
@@ -51,27 +38,8 @@ def add_cart(request, product_id):
             # ---- variation handling ----
             product_variations = []
             if product.has_variants:
-                # required categories ONLY for this product
-                required_categories = (
-                    Variation.objects.filter(product=product)
-                    .values_list("category__name", flat=True)
-                    .distinct()
-                )
-
-                for key, value in request.POST.items():
-                    if key in required_categories:
-                        try:
-                            variation = Variation.objects.get(
-                                product=product,
-                                category__name__iexact=key,
-                                name__iexact=value,
-                                is_active=True,
-                            )
-                            product_variations.append(variation)
-                        except Variation.DoesNotExist:
-                            continue
-
-                if len(product_variations) < len(required_categories):
+                product_variations, complete = get_variant_matrix(product.id).select(request.POST)
+                if not complete:
                     msg = "Please select all required variations for this product."
                     if request.headers.get("x-requested-with") == "XMLHttpRequest":
                         return JsonResponse({"status": "error", "message": msg}, status=400)
@@ -83,66 +51,36 @@ def add_cart(request, product_id):
                     )
 
             # ---- save cart item ----
-            if current_user.is_authenticated:
-                cart_item_qs = CartItem.objects.filter(product=product, user=current_user)
-            else:
-                cart, _ = Cart.objects.get_or_create(cart_id=_cart_id(request))
-                cart_item_qs = CartItem.objects.filter(product=product, cart=cart)
-
-            ex_var_list = []
-            id_list = []
-            for item in cart_item_qs:
-                existing_variations = list(item.variations.all())
-                ex_var_list.append(existing_variations)
-                id_list.append(item.id)
-
-            if product_variations in ex_var_list:
-                index = ex_var_list.index(product_variations)
-                item_id = id_list[index]
-                cart_item = CartItem.objects.get(product=product, id=item_id)
-                cart_item.quantity += quantity
-                cart_item.save()
-            else:
-                cart_item = CartItem.objects.create(
-                    product=product,
-                    quantity=quantity,
-                    user=current_user if current_user.is_authenticated else None,
-                    cart=None if current_user.is_authenticated else cart,
-                )
-                if product_variations:
-                    cart_item.variations.set(product_variations)
-                cart_item.save()
-
-            # ---- clean up wishlist ----
-            if current_user.is_authenticated:
-                wishlist_items = Wishlist.objects.filter(user=current_user, product=product)
-                for item in wishlist_items:
-                    if set(item.variations.all()) == set(product_variations):
-                        item.delete()
+            is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+            try:
+                with transaction.atomic():
+                    signature = add_to_line(request, product, product_variations, quantity)
 
-            # ---- Ajax response ----
-            if request.headers.get("x-requested-with") == "XMLHttpRequest":
-                try:
+                    # ---- clean up wishlist ----
                     if current_user.is_authenticated:
-                        cart_items = CartItem.objects.filter(user=current_user, is_active=True)
-                    else:
-                        cart = Cart.objects.get(cart_id=_cart_id(request))
-                        cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-
-                    total, tax, grand_total, total_cart_items = _calculate_cart_totals(cart_items)
-                    data = {
-                        "status": "success",
-                        "quantity": cart_item.quantity,
-                        "item_subtotal": str(cart_item.sub_total()),
-                        "total": str(total),
-                        "tax": str(tax),
-                        "grand_total": str(grand_total),
-                        "total_cart_items": total_cart_items,
-                        "cart_item_id": cart_item.id,
-                    }
-                    return JsonResponse(data)
-                except Exception as e:
-                    return JsonResponse({"status": "error", "message": f"Error calculating cart totals: {str(e)}"}, status=500)
+                        Wishlist.objects.filter(user=current_user, product=product, variation_signature=signature).delete()
+
+                    # totals from the same transaction as the update
+                    pricing = CartPricing.for_request(request, refresh=True) if is_ajax else None
+            except ValueError as e:
+                # session cart line limit reached
+                if is_ajax:
+                    return JsonResponse({"status": "error", "message": str(e)}, status=400)
+                messages.error(request, str(e))
+                return redirect("cart")
+            adjust_cart_count(request, quantity)
+
+            # ---- Ajax response ----
+            if is_ajax:
+                line = pricing.line_for(product.id, signature)
+                data = {
+                    "status": "success",
+                    "quantity": line.quantity,
+                    "item_subtotal": str(line.line_total),
+                    **pricing.as_json(),
+                    "cart_item_id": line.id,
+                }
+                return JsonResponse(data)
 
         except Exception as e:
             if request.headers.get("x-requested-with") == "XMLHttpRequest":
@@ -155,45 +93,18 @@ def add_cart(request, product_id):
 
 
 def remove_cart(request, product_id, cart_item_id):
-    product = get_object_or_404(Product, id=product_id)
-    cart_item = None
-    try:
-        if request.user.is_authenticated:
-            cart_item = CartItem.objects.get(product=product, user=request.user, id=cart_item_id)
-        else:
-            cart = Cart.objects.get(cart_id=_cart_id(request))
-            cart_item = CartItem.objects.get(product=product, cart=cart, id=cart_item_id)
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            cart_item.save()
-        else:
-            cart_item.delete()
-            cart_item = None
-    except CartItem.DoesNotExist:
-        pass
-
-    if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        if request.user.is_authenticated:
-            cart_items = CartItem.objects.filter(user=request.user, is_active=True)
-        else:
-            try:
-                cart = Cart.objects.get(cart_id=_cart_id(request))
-                cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-            except Cart.DoesNotExist:
-                cart_items = []
-        total, tax, grand_total, total_cart_items = _calculate_cart_totals(cart_items)
-        updated_quantity = 0
-        updated_item_subtotal = Decimal("0.00")
-        if cart_item:
-            updated_quantity = cart_item.quantity
-            updated_item_subtotal = cart_item.sub_total()
+    is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+    with transaction.atomic():
+        removed = remove_from_line(request, product_id, cart_item_id, quantity=1)
+        pricing = CartPricing.for_request(request, refresh=True) if is_ajax else None
+    adjust_cart_count(request, -removed)
+
+    if is_ajax:
+        line = pricing.line(cart_item_id)
         data = {
-            "quantity": updated_quantity,
-            "item_subtotal": str(updated_item_subtotal),
-            "total": str(total),
-            "tax": str(tax),
-            "grand_total": str(grand_total),
-            "total_cart_items": total_cart_items,
+            "quantity": line.quantity if line else 0,
+            "item_subtotal": str(line.line_total if line else Decimal("0.00")),
+            **pricing.as_json(),
             "cart_item_id": cart_item_id,
         }
         return JsonResponse(data)
@@ -201,32 +112,215 @@ def remove_cart(request, product_id, cart_item_id):
 
 
 def remove_cart_item(request, product_id, cart_item_id):
-    product = get_object_or_404(Product, id=product_id)
-    if request.user.is_authenticated:
-        cart_item = CartItem.objects.get(product=product, user=request.user, id=cart_item_id)
-    else:
-        cart = Cart.objects.get(cart_id=_cart_id(request))
-        cart_item = CartItem.objects.get(product=product, cart=cart, id=cart_item_id)
-    cart_item.delete()
+    removed = remove_from_line(request, product_id, cart_item_id)
+    adjust_cart_count(request, -removed)
     return redirect("cart")
 
 
+# --------------------------
+# Batch updates
+# --------------------------
+def _parse_operation(op):
+    """One batch operation -> (target, mode, amount), where target is ('line', id) or ('product', id, variations)."""
+    if not isinstance(op, dict):
+        raise ValueError("must be an object")
+    if ("quantity" in op) == ("delta" in op):
+        raise ValueError("needs exactly one of 'quantity' or 'delta'")
+    mode = "quantity" if "quantity" in op else "delta"
+    amount = int(op[mode])
+    if op.get("line") is not None:
+        return ("line", int(op["line"])), mode, amount
+    if op.get("product") is not None:
+        variations = op.get("variations") or {}
+        if isinstance(variations, list):
+            variations = [int(v) for v in variations]
+        elif not isinstance(variations, dict):
+            raise ValueError("'variations' must be an object or a list of ids")
+        return ("product", int(op["product"]), variations), mode, amount
+    raise ValueError("needs a 'line' or a 'product'")
+
+
+def _apply_operations(request, operations):
+    """
+    Apply batch operations to the visitor's cart: validate everything first
+    (one query for the cart lines, one for product stock), then write only
+    the lines whose quantity changes. Returns (errors, net unit change);
+    nothing is written when there are errors. Call inside transaction.atomic().
+    """
+    errors = []
+    parsed = []
+    for i, op in enumerate(operations):
+        try:
+            parsed.append((i, *_parse_operation(op)))
+        except (TypeError, ValueError) as e:
+            errors.append(f"Operation {i + 1}: {e}")
+
+    lines = line_snapshot(request)
+    by_key = {(product_id, signature): line_id for line_id, (product_id, signature, _) in lines.items()}
+    product_ids = {target[1] for _, target, _, _ in parsed if target[0] == "product"}
+    product_ids |= {lines[target[1]][0] for _, target, _, _ in parsed if target[0] == "line" and target[1] in lines}
+    products = Product.objects.only("id", "product_name", "stock", "has_variants", "is_available").in_bulk(product_ids)
+
+    # (product id, signature) -> [line id or None, current quantity, new quantity, variation ids]
+    changes = {}
+    for i, target, mode, amount in parsed:
+        if target[0] == "line":
+            if target[1] not in lines:
+                errors.append(f"Operation {i + 1}: unknown cart line {target[1]}.")
+                continue
+            product_id, signature, _ = lines[target[1]]
+            variation_ids = None
+        else:
+            product_id, chosen = target[1], target[2]
+            product = products.get(product_id)
+            if product is None or not product.is_available:
+                errors.append(f"Operation {i + 1}: unknown product {product_id}.")
+                continue
+            variation_ids = []
+            if product.has_variants:
+                matrix = get_variant_matrix(product_id)
+                if isinstance(chosen, dict):
+                    variation_ids, complete = matrix.select(chosen)
+                else:
+                    variation_ids = chosen
+                    complete = matrix.select_ids(variation_ids)
+                if not complete:
+                    errors.append(f"Operation {i + 1}: select all required variations for {product.product_name}.")
+                    continue
+            signature = variation_signature(variation_ids)
+
+        key = (product_id, signature)
+        if key not in changes:
+            line_id = by_key.get(key)
+            current = lines[line_id][2] if line_id else 0
+            changes[key] = [line_id, current, current, variation_ids]
+        change = changes[key]
+        change[2] = amount if mode == "quantity" else change[2] + amount
+
+    # Stock is per product, across all of its variation lines
+    wanted = {}
+    for (product_id, signature), line_id in by_key.items():
+        if (product_id, signature) not in changes and product_id in products:
+            wanted[product_id] = wanted.get(product_id, 0) + lines[line_id][2]
+    for (product_id, _), (line_id, current, new, _) in changes.items():
+        if new < 0:
+            errors.append(f"{products[product_id].product_name}: quantity cannot be negative.")
+        wanted[product_id] = wanted.get(product_id, 0) + max(new, 0)
+    for product_id, quantity in wanted.items():
+        product = products[product_id]
+        if quantity > product.stock:
+            errors.append(f"{product.product_name}: only {product.stock} in stock.")
+
+    # Session carts hold a limited number of lines; lines emptied by this batch make room
+    free_lines = free_cart_lines(request)
+    if free_lines is not None:
+        new_lines = sum(1 for line_id, _, new, _ in changes.values() if not line_id and new > 0)
+        emptied = sum(1 for line_id, _, new, _ in changes.values() if line_id and new <= 0)
+        if new_lines > free_lines + emptied:
+            errors.append(FULL_MESSAGE)
+    if errors:
+        return errors, 0
+
+    net = 0
+    # Shrink lines before adding new ones, so a full session cart has room for them
+    for (product_id, _), (line_id, current, new, variation_ids) in sorted(changes.items(), key=lambda c: c[1][2] > c[1][1]):
+        if new == current:
+            continue
+        if line_id:
+            set_line_quantity(request, line_id, new)
+        else:
+            add_to_line(request, products[product_id], variation_ids, new)
+        net += new - current
+    return errors, net
+
+
+@require_POST
+def update_cart(request):
+    """
+    JSON batch endpoint. Body: {"operations": [{"line": id | "product": id, "variations": {...} | [ids],
+    "quantity": n | "delta": n}, ...]}. All operations apply in one transaction, or none do.
+    """
+    try:
+        payload = json.loads(request.body or b"{}")
+        operations = payload.get("operations") if isinstance(payload, dict) else payload
+        if not isinstance(operations, list):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Expected a JSON list of operations."}, status=400)
+
+    with transaction.atomic():
+        errors, net = _apply_operations(request, operations)
+        if errors:
+            return JsonResponse({"status": "error", "errors": errors}, status=400)
+        pricing = CartPricing.for_request(request, refresh=True)
+    adjust_cart_count(request, net)
+
+    data = {
+        "status": "success",
+        "lines": [
+            {
+                "cart_item_id": line.id,
+                "product_id": line.product_id,
+                "quantity": line.quantity,
+                "item_subtotal": str(line.line_total),
+            }
+            for line in pricing.lines
+        ],
+        **pricing.as_json(),
+    }
+    return JsonResponse(data)
+
+
+# --------------------------
+# Quick order
+# --------------------------
+def quick_order(request):
+    """Paste "code, qty" lines or upload a CSV; every matched part is added to the cart at once."""
+    lines = ""
+    result = None
+    if request.method == "POST":
+        lines = request.POST.get("lines", "")
+        entries, errors = quick_order_service.parse_lines(lines)
+        upload = request.FILES.get("file")
+        if upload:
+            if upload.size > quick_order_service.MAX_UPLOAD_BYTES:
+                errors.append("The uploaded file is too large.")
+            else:
+                text = upload.read().decode("utf-8-sig", errors="replace")
+                file_entries, file_errors = quick_order_service.parse_lines(text, label="File line")
+                entries += file_entries
+                errors += file_errors
+
+        is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+        with transaction.atomic():
+            result = quick_order_service.add_entries(request, entries)
+            pricing = CartPricing.for_request(request, refresh=True) if is_ajax else None
+        adjust_cart_count(request, result["units"])
+        result["errors"] = errors + result["errors"]
+
+        if is_ajax:
+            return JsonResponse({
+                "status": "success" if result["added"] else "error",
+                "added": [
+                    {"product_id": product.id, "product": product.product_name, "quantity": quantity}
+                    for product, quantity in result["added"]
+                ],
+                "unmatched": result["unmatched"],
+                "errors": result["errors"],
+                **pricing.as_json(),
+            })
+        if result["added"]:
+            messages.success(request, f"Added {len(result['added'])} product(s) to your cart.")
+
+    return render(request, "store/quick_order.html", {"lines": lines, "result": result})
+
+
 # --------------------------
 # Views
 # --------------------------
 @login_required(login_url="login")
 def cart(request, total=0, quantity=0, cart_items=None):
-    try:
-        tax = Decimal("0.00")
-        grand_total = Decimal("0.00")
-        if request.user.is_authenticated:
-            cart_items = CartItem.objects.filter(user=request.user, is_active=True)
-        else:
-            cart = Cart.objects.get(cart_id=_cart_id(request))
-            cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-        total, tax, grand_total, quantity = _calculate_cart_totals(cart_items)
-    except ObjectDoesNotExist:
-        pass
+    pricing = CartPricing.for_request(request)
 
     initial_data = {}
     if request.user.is_authenticated:
@@ -250,16 +344,17 @@ def cart(request, total=0, quantity=0, cart_items=None):
     form = OrderForm(request.POST or None, initial=initial_data or request.session.get('billing_data', {}))
     if request.method == "POST":
         if form.is_valid():
-            request.session['billing_data'] = form.cleaned_data  # Save to session
+            # Blank fields are left out: readers use .get() and the form treats missing as empty
+            request.session['billing_data'] = {k: v for k, v in form.cleaned_data.items() if v not in ('', None)}
             return redirect("checkout")
         # Else, form errors will show in template (you can add {{ form.errors }} in cart.html if needed)
 
     context = {
-        "total": total,
-        "quantity": quantity,
-        "cart_items": cart_items,
-        "tax": tax,
-        "grand_total": grand_total,
+        "total": pricing.subtotal,
+        "quantity": pricing.quantity,
+        "cart_items": pricing.lines,
+        "tax": pricing.tax,
+        "grand_total": pricing.grand_total,
         "form": form,
     }
     return render(request, "store/cart.html", context)
@@ -272,14 +367,12 @@ def checkout(request, total=0, quantity=0, cart_items=None):
         userprofile = None
 
         if request.user.is_authenticated:
-            cart_items = CartItem.objects.filter(user=request.user, is_active=True)
             userprofile = get_object_or_404(UserProfile, user=request.user)
-        else:
-            cart = Cart.objects.get(cart_id=_cart_id(request))
-            cart_items = CartItem.objects.filter(cart=cart, is_active=True)
 
-        # calculate subtotal + tax
-        total, tax, grand_total, quantity = _calculate_cart_totals(cart_items)
+        # subtotal + tax
+        pricing = CartPricing.for_request(request)
+        cart_items = pricing.lines
+        total, tax, grand_total, quantity = pricing.subtotal, pricing.tax, pricing.grand_total, pricing.quantity
 
         # Fetch EasyPost rates using session billing_data
         billing_data = request.session.get('billing_data', {})
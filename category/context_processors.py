@@ -1,4 +1,6 @@
+from store.lazy import lazy_context
+
+
 def menu_links(request):
-    from category.models import Category
-    links = Category.objects.all()
-    return dict(links=links)
\ No newline at end of file
+    from category.menu import get_menu
+    return dict(links=lazy_context(request, 'links', get_menu))
@@ -0,0 +1,38 @@
+"""
+Category menu shared by every template render.
+
+The menu (categories with their count of available products) is built with
+one query and kept per worker process. store.signals bumps MENU_VERSION_KEY in
+the shared cache when a Category or Product changes, so every worker rebuilds
+on its next render and not before.
+"""
+from django.db.models import Count, Q
+
+from store.catalog import WorkerCache, bump_version, get_version
+
+from .models import Category
+
+MENU_VERSION_KEY = 'category:menu_version'
+
+
+def get_menu_version():
+    return get_version(MENU_VERSION_KEY)
+
+
+def bump_menu_version():
+    return bump_version(MENU_VERSION_KEY)
+
+
+def build_menu():
+    return tuple(
+        Category.objects
+        .annotate(product_count=Count('product', filter=Q(product__is_available=True)))
+        .order_by('id')
+    )
+
+
+_menu = WorkerCache(build_menu, version=get_menu_version)
+
+
+def get_menu():
+    return _menu.get()
@@ -1,3 +1,49 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from store.models import Product
+from . import menu
+from .models import Category
+
+
+class CategoryMenuTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.regulators = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.hoses = Category.objects.create(category_name='Hoses', slug='hoses')
+        cls.product = Product.objects.create(
+            product_name='Oxygen Regulator', slug='oxygen-regulator', price=100, stock=5,
+            category=cls.regulators, images='photos/products/regulator.jpg',
+        )
+
+    def setUp(self):
+        cache.clear()
+        menu._menu.clear()
+
+    def counts(self):
+        return [(category.slug, category.product_count) for category in menu.get_menu()]
+
+    def test_menu_counts_available_products(self):
+        Product.objects.create(
+            product_name='Old Regulator', slug='old-regulator', price=100, stock=5,
+            category=self.regulators, images='photos/products/regulator.jpg', is_available=False,
+        )
+        self.assertEqual(self.counts(), [('regulators', 1), ('hoses', 0)])
+
+    def test_built_menu_needs_no_queries(self):
+        menu.get_menu()
+        with self.assertNumQueries(0):
+            menu.get_menu()
+
+    def test_menu_is_rebuilt_after_product_change(self):
+        self.counts()
+        self.product.category = self.hoses
+        self.product.save()
+        self.assertEqual(self.counts(), [('regulators', 0), ('hoses', 1)])
+
+    def test_menu_is_rebuilt_after_category_change(self):
+        self.counts()
+        Category.objects.create(category_name='Torches', slug='torches')
+        self.assertEqual(self.counts(), [('regulators', 1), ('hoses', 0), ('torches', 0)])
+        self.hoses.delete()
+        self.assertEqual(self.counts(), [('regulators', 1), ('torches', 0)])
@@ -0,0 +1,8 @@
+"""
+Database configuration, backends and tooling for the project.
+
+estore.db.env builds DATABASES entries from the environment (SQLite or
+Postgres); estore.db.sqlite3 is the SQLite backend with production pragmas,
+estore.db.benchmark the lock-contention benchmark behind its defaults, and
+estore.db.routers the optional read replica for catalog reads.
+"""
@@ -0,0 +1,135 @@
+"""
+SQLite lock-contention benchmark: stock Django settings vs estore.db.sqlite3.
+
+Writer threads run checkout-shaped transactions (read stock, insert an order
+row, decrement stock) while reader threads run catalog-style SELECTs, all on
+one database file. Each profile reports committed transactions, "database is
+locked" failures and write latency.
+
+    python -m estore.db.benchmark --writers 8 --readers 8 --seconds 5
+
+Uses the sqlite3 module directly (no Django setup needed) and issues the
+same pragmas and BEGIN statements the two backends do.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from .sqlite3.base import PRAGMAS
+
+PROFILES = {
+    # django.db.backends.sqlite3: rollback journal, deferred BEGIN, 5 s sqlite3 timeout
+    'stock': {'pragmas': {}, 'begin': 'BEGIN'},
+    'tuned': {'pragmas': PRAGMAS, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def _setup(path, products=500):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript("""
+        CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, price REAL, stock INTEGER);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, product_id INTEGER, quantity INTEGER, created REAL);
+    """)
+    conn.executemany(
+        'INSERT INTO product (id, name, price, stock) VALUES (?, ?, ?, ?)',
+        [(i, f'Product {i}', 10.0 + i % 90, 10 ** 6) for i in range(1, products + 1)],
+    )
+    conn.close()
+
+
+def run_profile(name, writers, readers, seconds):
+    profile = PROFILES[name]
+    directory = tempfile.mkdtemp(prefix='estore-bench-')
+    path = os.path.join(directory, 'bench.sqlite3')
+    _setup(path)
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+    stats = {'commits': 0, 'locked': 0, 'reads': 0, 'latencies': []}
+
+    def writer(seed):
+        conn = _connect(path, profile['pragmas'])
+        product_id = seed
+        while time.monotonic() < stop:
+            product_id = product_id % 500 + 1
+            started = time.monotonic()
+            try:
+                conn.execute(profile['begin'])
+                conn.execute('SELECT stock FROM product WHERE id = ?', (product_id,)).fetchone()
+                conn.execute('INSERT INTO orders (product_id, quantity, created) VALUES (?, 1, ?)', (product_id, started))
+                conn.execute('UPDATE product SET stock = stock - 1 WHERE id = ?', (product_id,))
+                conn.execute('COMMIT')
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                with lock:
+                    stats['locked'] += 1
+                continue
+            with lock:
+                stats['commits'] += 1
+                stats['latencies'].append(time.monotonic() - started)
+        conn.close()
+
+    def reader(seed):
+        conn = _connect(path, profile['pragmas'])
+        while time.monotonic() < stop:
+            try:
+                conn.execute(
+                    'SELECT id, name, price FROM product WHERE price > ? ORDER BY price LIMIT 12', (seed % 50,)
+                ).fetchall()
+            except sqlite3.OperationalError:
+                with lock:
+                    stats['locked'] += 1
+                continue
+            with lock:
+                stats['reads'] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=writer, args=(i * 37,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    latencies = sorted(stats['latencies'])
+    return {
+        'profile': name,
+        'commits_per_s': stats['commits'] / seconds,
+        'reads_per_s': stats['reads'] / seconds,
+        'locked': stats['locked'],
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args(argv)
+    print(f"{'profile':8} {'commits/s':>10} {'reads/s':>10} {'locked':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in PROFILES:
+        result = run_profile(name, args.writers, args.readers, args.seconds)
+        p50 = f"{result['p50_ms']:.2f}" if result['p50_ms'] is not None else '-'
+        p95 = f"{result['p95_ms']:.2f}" if result['p95_ms'] is not None else '-'
+        print(f"{name:8} {result['commits_per_s']:10.0f} {result['reads_per_s']:10.0f} {result['locked']:8d} {p50:>8} {p95:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+DATABASES entries built from environment variables (python-decouple).
+
+    DB_ENGINE        sqlite (default) or postgres
+    DB_NAME          SQLite file path, or Postgres database name
+    DB_USER / DB_PASSWORD / DB_HOST / DB_PORT / DB_SSLMODE    (postgres)
+    DB_CONN_MAX_AGE  seconds a connection is kept open between requests (600)
+    DB_POOL          postgres only: '' (persistent connections), 'pgbouncer'
+                     (behind a transaction-pooling PgBouncer) or 'psycopg'
+                     (Django's built-in psycopg pool, Django 5.1+)
+    DB_POOL_MIN / DB_POOL_MAX    psycopg pool size (2 / 10)
+
+SQLite additionally follows SQLITE_PROFILE (see estore.db.sqlite3). Another
+prefix (e.g. DB_REPLICA) reads the same variables under that prefix.
+"""
+import django
+from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+
+POOLS = ('', 'pgbouncer', 'psycopg')
+
+
+def database_from_env(prefix='DB', sqlite_name=None):
+    engine = config(f'{prefix}_ENGINE', default='sqlite')
+    entry = {
+        'CONN_MAX_AGE': config(f'{prefix}_CONN_MAX_AGE', default=600, cast=int),
+        # Reused connections are pinged before each request's first query
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+    if engine == 'sqlite':
+        tuned = config('SQLITE_PROFILE', default='tuned') == 'tuned'
+        entry.update({
+            'ENGINE': 'estore.db.sqlite3' if tuned else 'django.db.backends.sqlite3',
+            'NAME': config(f'{prefix}_NAME', default='') or str(sqlite_name or ''),
+        })
+        return entry
+
+    if engine != 'postgres':
+        raise ImproperlyConfigured(f"{prefix}_ENGINE must be 'sqlite' or 'postgres', not {engine!r}")
+
+    pool = config(f'{prefix}_POOL', default='')
+    if pool not in POOLS:
+        raise ImproperlyConfigured(f"{prefix}_POOL must be one of {POOLS}, not {pool!r}")
+    entry.update({
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config(f'{prefix}_NAME', default='') or 'estore',
+        'USER': config(f'{prefix}_USER', default='') or 'estore',
+        'PASSWORD': config(f'{prefix}_PASSWORD', default=''),
+        'HOST': config(f'{prefix}_HOST', default='') or 'localhost',
+        'PORT': config(f'{prefix}_PORT', default='') or '5432',
+        'OPTIONS': {
+            'sslmode': config(f'{prefix}_SSLMODE', default='prefer'),
+            'connect_timeout': 5,
+        },
+    })
+    if pool == 'pgbouncer':
+        # Transaction pooling hands each transaction a different server connection,
+        # so named cursors (which outlive a transaction) cannot be used
+        entry['DISABLE_SERVER_SIDE_CURSORS'] = True
+    elif pool == 'psycopg':
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured(f"{prefix}_POOL=psycopg needs Django 5.1+; use pgbouncer or persistent connections")
+        entry['CONN_MAX_AGE'] = 0  # the pool owns connection lifetime
+        entry['OPTIONS']['pool'] = {
+            'min_size': config(f'{prefix}_POOL_MIN', default=2, cast=int),
+            'max_size': config(f'{prefix}_POOL_MAX', default=10, cast=int),
+        }
+    return entry
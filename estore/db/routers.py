@@ -0,0 +1,104 @@
+"""
+Read-replica routing for catalog reads.
+
+When settings.DATABASES has a 'replica' alias (DB_REPLICA_* variables, see
+estore.db.env), CatalogReplicaRouter sends reads of the catalog models to it
+and everything else, and every write, to 'default'. Only requests opted in by
+ReplicaPinningMiddleware use the replica; management commands, the shell and
+tests read from the primary.
+
+A request is pinned to the primary as soon as it writes anything, and the
+visitor's session stays pinned for DB_REPLICA_PIN_SECONDS afterwards so the
+page they are redirected to does not read a replica that has not caught up.
+Values cached under a version stamp are built inside primary() for the same
+reason: a replica lagging behind the bump would be cached as current.
+
+To try it locally, copy the database and point the replica at the copy:
+
+    sqlite3 db.sqlite3 ".backup db-replica.sqlite3"
+    DB_REPLICA_ENGINE=sqlite DB_REPLICA_NAME=db-replica.sqlite3 python manage.py runserver
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+REPLICA = 'replica'
+PRIMARY = 'default'
+PIN_SESSION_KEY = '_db_primary_until'
+PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+CATALOG_MODELS = {
+    'category.category',
+    'store.brand',
+    'store.product',
+    'store.productcard',
+    'store.productdownload',
+    'store.productgallery',
+    'store.reviewrating',
+    'store.variation',
+    'store.variationcategory',
+}
+
+# Per request: {'primary': reads must use the primary, 'wrote': the request wrote something}.
+# None outside ReplicaPinningMiddleware, which means primary only.
+_routing = ContextVar('estore_db_routing', default=None)
+
+
+@contextmanager
+def primary():
+    """Route every read in the block to the primary."""
+    token = _routing.set({'primary': True, 'wrote': False})
+    try:
+        yield
+    finally:
+        state = _routing.get()
+        _routing.reset(token)
+        outer = _routing.get()
+        if outer is not None and state['wrote']:
+            outer.update(primary=True, wrote=True)
+
+
+class CatalogReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state['primary'] or model._meta.label_lower not in CATALOG_MODELS:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.update(primary=True, wrote=True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, never migrated on its own
+        return db != REPLICA
+
+
+class ReplicaPinningMiddleware:
+    """Opts requests into replica reads, unless the session wrote recently."""
+
+    def __init__(self, get_response):
+        if REPLICA not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = request.session.get(PIN_SESSION_KEY, 0) > time.time()
+        state = {'primary': pinned, 'wrote': False}
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if state['wrote']:
+            request.session[PIN_SESSION_KEY] = time.time() + PIN_SECONDS
+        return response
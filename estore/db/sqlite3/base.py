@@ -0,0 +1,46 @@
+"""
+SQLite backend tuned for a small production site.
+
+Every new connection gets the pragmas below (WAL so readers never block the
+writer, a busy timeout instead of failing with "database is locked",
+synchronous=NORMAL, which is durable in WAL mode except on power loss, plus a
+memory-mapped and larger page cache). Transactions start with BEGIN
+IMMEDIATE: a deferred BEGIN that later tries to write fails at once with
+SQLITE_BUSY when another connection holds the write lock, since SQLite cannot
+wait on it without risking a deadlock; an immediate one waits for the busy
+timeout.
+
+Override pragmas per database with OPTIONS['pragmas'] (merged over the
+defaults) and the BEGIN variant with OPTIONS['transaction_mode'].
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,             # ms
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,   # bytes
+    'cache_size': -20000,             # negative = KiB, so ~20 MB
+}
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}")
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
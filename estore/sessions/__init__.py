@@ -0,0 +1,45 @@
+"""
+Session engines that write only when the session's content changed.
+
+Django saves a session whenever it is marked modified, even if the values
+were re-set to what they already were (a re-posted billing form, an
+unchanged session cart, the timeout middleware's activity stamp...). These
+engines remember what was loaded and skip the write when the data to save
+is identical. Pick one with SESSION_BACKEND:
+
+    db              estore.sessions.db (default)
+    cached_db       estore.sessions.cached_db: reads served from the cache
+    signed_cookies  estore.sessions.signed_cookies: no server-side storage;
+                    the cookie carries the data, so keep it under ~4 KB
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = ('db', 'cached_db', 'signed_cookies')
+
+
+def session_engine(backend):
+    """SESSION_ENGINE path for a SESSION_BACKEND name."""
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(f"SESSION_BACKEND must be one of {BACKENDS}, not {backend!r}")
+    return f'estore.sessions.{backend}'
+
+
+class WriteOnChangeMixin:
+    def _snapshot(self, data):
+        # The same JSON the session is stored as, minus the signature and timestamp
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._loaded_snapshot = self._snapshot(data)
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and self.session_key is not None
+            and getattr(self, '_loaded_snapshot', None) == self._snapshot(self._get_session())
+        ):
+            return
+        super().save(must_create=must_create)
+        self._loaded_snapshot = self._snapshot(self._get_session())
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+from . import WriteOnChangeMixin
+
+
+class SessionStore(WriteOnChangeMixin, DBStore):
+    pass
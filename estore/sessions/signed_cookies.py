@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.signed_cookies import SessionStore as SignedCookieStore
+
+from . import WriteOnChangeMixin
+
+
+class SessionStore(WriteOnChangeMixin, SignedCookieStore):
+    pass
@@ -6,9 +6,12 @@ https://docs.djangoproject.com/en/3.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
+import tempfile
 from pathlib import Path
 from django.contrib.messages import constants as messages
 from decouple import config
+from estore.db.env import database_from_env
+from estore.sessions import session_engine
 from django.conf.global_settings import STATIC_ROOT, STATICFILES_DIRS, AUTH_USER_MODEL, MEDIA_URL, MEDIA_ROOT, \
     EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, EMAIL_USE_TLS
 from django.template.context_processors import media
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'estore.db.routers.ReplicaPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -67,6 +71,10 @@ LOGIN_REDIRECT_URL = '/securelogin/'
 LOGOUT_REDIRECT_URL = '/securelogin/login/'
 SESSION_EXPIRE_SECONDS = 7200  # For testing; change to 3600 later
 SESSION_EXPIRE_AFTER_LAST_ACTIVITY = True
+# The timeout middleware re-stamps last activity (a session write) at most this often, in seconds
+SESSION_EXPIRE_AFTER_LAST_ACTIVITY_GRACE_PERIOD = config('SESSION_ACTIVITY_RESOLUTION', default=60, cast=int)
+# db, cached_db or signed_cookies; all of them skip writes when nothing changed (see estore/sessions)
+SESSION_ENGINE = session_engine(config('SESSION_BACKEND', default='db'))
 
 # Axes Settings
 AXES_ENABLED = True
@@ -105,12 +113,46 @@ AUTH_USER_MODEL = 'accounts.Account'
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
+# Database: SQLite by default, Postgres with DB_ENGINE=postgres (variables in estore/db/env.py).
+# SQLITE_PROFILE=tuned uses estore.db.sqlite3 (WAL, busy_timeout, synchronous=NORMAL,
+# mmap, larger page cache, BEGIN IMMEDIATE); 'stock' is Django's plain backend.
+# `python -m estore.db.benchmark` compares the two under concurrent writes.
+# Connections persist DB_CONN_MAX_AGE seconds with health checks.
 DATABASES = {
+    'default': database_from_env('DB', sqlite_name=BASE_DIR / 'db.sqlite3'),
+}
+# Optional read replica for catalog browsing (estore/db/routers.py): set DB_REPLICA_ENGINE
+# and the other DB_REPLICA_* variables. Sessions stay on the primary for
+# DB_REPLICA_PIN_SECONDS after a write so they read their own changes.
+if config('DB_REPLICA_ENGINE', default=''):
+    DATABASES['replica'] = {
+        **database_from_env('DB_REPLICA'),
+        # Tests read the replica alias through the default connection
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['estore.db.routers.CatalogReplicaRouter']
+REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# Cache
+# Catalog version stamps, product detail bundles and search counts live here, so
+# the cache must be shared by every worker for invalidations to reach them all:
+# file-based by default, or any shared backend through CACHE_BACKEND/CACHE_LOCATION
+# (never a per-process one such as LocMemCache under a multi-worker server).
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(Path(tempfile.gettempdir()) / 'estore_cache')),
+        'TIMEOUT': 300,
     }
 }
+STORE_PRODUCT_CACHE_TIMEOUT = config('STORE_PRODUCT_CACHE_TIMEOUT', default=3600, cast=int)
+CART_COUNT_CACHE_TIMEOUT = config('CART_COUNT_CACHE_TIMEOUT', default=900, cast=int)
+# 'session': anonymous carts live in the session and reach the database at login;
+# 'db': every anonymous add creates Cart/CartItem rows.
+CART_ANONYMOUS_STORAGE = config('CART_ANONYMOUS_STORAGE', default='session')
+# Anonymous database carts idle this long are deleted by `manage.py purge_stale_carts`
+CART_STALE_DAYS = config('CART_STALE_DAYS', default=30, cast=int)
+CART_PURGE_BATCH_SIZE = config('CART_PURGE_BATCH_SIZE', default=500, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -209,6 +251,10 @@ LOGGING = {
             'handlers': ['console'],
             'level': 'INFO',  # Changed from DEBUG to INFO
         },
+        # Set to DEBUG to log what each lazy context processor value costs per request
+        'store.lazy': {
+            'level': config('CONTEXT_TIMING_LOG_LEVEL', default='INFO'),
+        },
     },
 }
 
@@ -0,0 +1,170 @@
+import os
+import tempfile
+from importlib import import_module
+from unittest import mock
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase
+
+from estore.db.env import database_from_env
+from estore.sessions import BACKENDS, session_engine
+from estore.sessions import db as db_sessions
+
+
+class SessionEngineSettingTests(SimpleTestCase):
+    def test_known_backends_map_to_importable_engines(self):
+        for backend in BACKENDS:
+            engine = session_engine(backend)
+            self.assertEqual(engine, f'estore.sessions.{backend}')
+            self.assertTrue(issubclass(import_module(engine).SessionStore, SessionBase))
+
+    def test_unknown_backend_is_rejected(self):
+        for backend in ('cache', 'file', ''):
+            with self.assertRaises(ImproperlyConfigured):
+                session_engine(backend)
+
+
+class WriteOnChangeSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def stored(self, backend, data):
+        store = import_module(session_engine(backend)).SessionStore()
+        store.update(data)
+        store.save()
+        return store.session_key
+
+    def test_unchanged_session_is_not_written(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                SessionStore = import_module(session_engine(backend)).SessionStore
+                session = SessionStore(self.stored(backend, {'cart': [1, 2], 'viewed_products': [3]}))
+                session['cart'] = [1, 2]
+                # Save of the engine Django ships, just past the write-on-change mixin
+                parent = SessionStore.__mro__[2]
+                with mock.patch.object(parent, 'save') as save:
+                    session.save()
+                    save.assert_not_called()
+                    session['cart'] = [1, 2, 4]
+                    session.save()
+                    save.assert_called_once()
+
+    def test_unchanged_database_session_costs_no_query(self):
+        session = db_sessions.SessionStore(self.stored('db', {'billing_data': {'city': 'Austin'}}))
+        session['billing_data'] = {'city': 'Austin'}
+        session.modified = True
+        with self.assertNumQueries(0):
+            session.save()
+
+        session['billing_data'] = {'city': 'Dallas'}
+        session.save()
+        self.assertEqual(db_sessions.SessionStore(session.session_key)['billing_data'], {'city': 'Dallas'})
+
+    def test_new_session_is_always_written(self):
+        session = db_sessions.SessionStore()
+        session.save()
+        self.assertTrue(db_sessions.SessionStore().exists(session.session_key))
+
+
+class TunedSQLiteTests(SimpleTestCase):
+    def connect(self, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # A private handler, so the test database and SimpleTestCase's guard on it are not involved
+        handler = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.dummy'},
+            'tuned': {'ENGINE': 'estore.db.sqlite3', 'NAME': os.path.join(directory.name, 'db.sqlite3'), 'OPTIONS': options},
+        })
+        connection = handler['tuned']
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connections_get_the_pragmas(self):
+        connection = self.connect()
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(connection, 'cache_size'), -20000)
+
+    def test_options_override_pragmas(self):
+        connection = self.connect(pragmas={'busy_timeout': 250, 'synchronous': 'FULL'})
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 250)
+        self.assertEqual(self.pragma(connection, 'synchronous'), 2)
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+
+    def test_transactions_begin_immediate(self):
+        for options, expected in (({}, 'BEGIN IMMEDIATE'), ({'transaction_mode': 'deferred'}, 'BEGIN DEFERRED')):
+            connection = self.connect(**options)
+            statements = []
+            with connection.execute_wrapper(lambda execute, sql, *args: statements.append(sql) or execute(sql, *args)):
+                # What atomic() does on entry and exit
+                connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                connection.rollback()
+                connection.set_autocommit(True)
+            self.assertEqual(statements[0], expected)
+
+    def test_unknown_transaction_mode_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.connect(transaction_mode='eventually').ensure_connection()
+
+
+class DatabaseFromEnvTests(SimpleTestCase):
+    def settings_for(self, prefix='DB', sqlite_name=None, **variables):
+        environ = {key: value for key, value in os.environ.items() if not key.startswith(('DB_', 'SQLITE_'))}
+        with mock.patch.dict(os.environ, {**environ, **variables}, clear=True):
+            return database_from_env(prefix, sqlite_name=sqlite_name)
+
+    def test_sqlite_defaults_to_the_tuned_backend(self):
+        entry = self.settings_for(sqlite_name='/srv/estore/db.sqlite3')
+        self.assertEqual(entry['ENGINE'], 'estore.db.sqlite3')
+        self.assertEqual(entry['NAME'], '/srv/estore/db.sqlite3')
+        self.assertEqual((entry['CONN_MAX_AGE'], entry['CONN_HEALTH_CHECKS']), (600, True))
+
+    def test_stock_sqlite_profile_and_name(self):
+        entry = self.settings_for(SQLITE_PROFILE='stock', DB_NAME='/tmp/other.sqlite3', DB_CONN_MAX_AGE='0')
+        self.assertEqual(
+            (entry['ENGINE'], entry['NAME'], entry['CONN_MAX_AGE']),
+            ('django.db.backends.sqlite3', '/tmp/other.sqlite3', 0),
+        )
+
+    def test_postgres_with_persistent_connections(self):
+        entry = self.settings_for(DB_ENGINE='postgres', DB_HOST='db.internal', DB_PASSWORD='secret')
+        self.assertEqual(entry['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(
+            (entry['NAME'], entry['USER'], entry['PASSWORD'], entry['HOST'], entry['PORT']),
+            ('estore', 'estore', 'secret', 'db.internal', '5432'),
+        )
+        self.assertEqual(entry['OPTIONS'], {'sslmode': 'prefer', 'connect_timeout': 5})
+        self.assertEqual(entry['CONN_MAX_AGE'], 600)
+        self.assertNotIn('DISABLE_SERVER_SIDE_CURSORS', entry)
+
+    def test_postgres_behind_pgbouncer(self):
+        entry = self.settings_for(DB_ENGINE='postgres', DB_POOL='pgbouncer', DB_PORT='6432')
+        self.assertTrue(entry['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(entry['PORT'], '6432')
+
+    def test_psycopg_pool_needs_django_5_1(self):
+        with mock.patch('django.VERSION', (5, 0, 0, 'final', 0)), self.assertRaises(ImproperlyConfigured):
+            self.settings_for(DB_ENGINE='postgres', DB_POOL='psycopg')
+        with mock.patch('django.VERSION', (5, 1, 0, 'final', 0)):
+            entry = self.settings_for(DB_ENGINE='postgres', DB_POOL='psycopg', DB_POOL_MAX='20')
+        self.assertEqual(entry['CONN_MAX_AGE'], 0)
+        self.assertEqual(entry['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20})
+
+    def test_other_prefixes_read_their_own_variables(self):
+        entry = self.settings_for('DB_REPLICA', DB_ENGINE='postgres', DB_REPLICA_ENGINE='sqlite', DB_REPLICA_NAME='r.db')
+        self.assertEqual((entry['ENGINE'], entry['NAME']), ('estore.db.sqlite3', 'r.db'))
+
+    def test_invalid_engine_and_pool_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.settings_for(DB_ENGINE='mysql')
+        with self.assertRaises(ImproperlyConfigured):
+            self.settings_for(DB_ENGINE='postgres', DB_POOL='pgpool')
@@ -1,16 +1,12 @@
 from django.shortcuts import render, redirect
-from store.models import Product, ReviewRating
+from store.models import ProductCard
 
 def home (request):
-    products = Product.objects.all().filter(is_available=True).order_by('-created_date')
-
-    # Get Reviews
-    for product in products:
-        reviews = ReviewRating.objects.filter(product_id=product.id, status=True)
+    # Listing read model: one query for every card, ratings included
+    products = ProductCard.objects.filter(is_available=True).order_by('-created_date')
 
     context = {
         'products': products,
-        'reviews': reviews,
     }
     return render(request, 'home.html', context)
 
@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_sitesettings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_ordered', False)), fields=['paypal_order_id'], name='order_open_paypal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_ordered', False)), fields=['user', '-created_at'], name='order_open_user_idx'),
+        ),
+    ]
@@ -102,6 +102,14 @@ class Order(models.Model):
     paypal_authorization_id = models.CharField(max_length=255, blank=True, null=True)
     paypal_order_id = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        # Open (unplaced) orders are looked up by PayPal order id and by user during checkout;
+        # partial indexes only cover those, so they stay small as placed orders pile up
+        indexes = [
+            models.Index(fields=['paypal_order_id'], condition=models.Q(is_ordered=False), name='order_open_paypal_idx'),
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_ordered=False), name='order_open_user_idx'),
+        ]
+
     def full_name(self):
         return f'{self.first_name} {self.last_name}'
 
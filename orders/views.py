@@ -1,11 +1,10 @@
 from datetime import date
 
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
-from django.core.exceptions import ObjectDoesNotExist
 from .forms import OrderForm
-from carts.models import Cart, CartItem
+from carts.models import CartItem
 from .models import Order, OrderProduct, Payment, PayPalWebhookLog
 import json, logging
 from decimal import Decimal
@@ -14,7 +13,8 @@ from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
-from carts.views import _cart_id, _calculate_cart_totals
+from carts.pricing import CartPricing
+from carts.utils import forget_cart_count
 from orders.shipping.easypost_client import retrieve_shipment
 
 
@@ -26,26 +26,12 @@ def get_shipping_quote(request):
     if request.method != "POST":
         return JsonResponse({"success": False, "error": "Invalid request method."}, status=400)
 
-    current_user = request.user
-
-    # --- Get cart items ---
-    if current_user.is_authenticated:
-        cart_items = CartItem.objects.filter(user=current_user, is_active=True)
-    else:
-        try:
-            cart = Cart.objects.get(cart_id=_cart_id(request))
-            cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-        except ObjectDoesNotExist:
-            cart_items = []
+    pricing = CartPricing.for_request(request)
+    cart_items = pricing.lines
 
     if not cart_items:
         return JsonResponse({"success": False, "error": "Your cart is empty."}, status=400)
 
-    # --- Subtotal (not strictly required for shipping) ---
-    subtotal = Decimal("0.00")
-    for cart_item in cart_items:
-        subtotal += Decimal(cart_item.sub_total())
-
     # --- Call EasyPost using CART, not ORDER ---
     try:
         from orders.shipping.easypost_client import create_shipment_from_cart
@@ -110,21 +96,12 @@ def place_order(request):
     if not form.is_valid():
         return HttpResponseBadRequest(str(form.errors))
 
-    # Get cart and items
-    try:
-        if request.user.is_authenticated:
-            cart_items = CartItem.objects.filter(user=request.user, is_active=True)
-        else:
-            cart = get_object_or_404(Cart, cart_id=_cart_id(request))
-            cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-    except:
-        return HttpResponseBadRequest("Cart not found.")
-
-    if not cart_items.exists():
+    # Get cart items, subtotal + tax
+    pricing = CartPricing.for_request(request)
+    cart_items = pricing.lines
+    if not cart_items:
         return redirect('cart')  # Empty cart
-
-    # Calculate subtotal + tax
-    subtotal, tax, _, _ = _calculate_cart_totals(cart_items)
+    subtotal, tax = pricing.subtotal, pricing.tax
 
     # Get selected rate ID from POST
     selected_rate_id = request.POST.get('selected_rate_id')
@@ -189,11 +166,12 @@ def place_order(request):
             user=request.user,
             product=cart_item.product,
             quantity=cart_item.quantity,
-            product_price = cart_item.sub_total() / cart_item.quantity,  # if you want modifiers, adjust here
+            product_price=cart_item.unit_price,  # base price + variation modifiers
             ordered=False,
         )
-        if cart_item.variations.exists():
-            order_product.variations.set(cart_item.variations.all())
+        variations = cart_item.variations.all()
+        if variations:
+            order_product.variations.set(variations)
 
     # Redirect to PayPal
     try:
@@ -283,6 +261,7 @@ def paypal_return(request):
 
         # Clear the cart
         CartItem.objects.filter(user=request.user).delete()
+        forget_cart_count(user=request.user)
 
         # Send confirmation email
         total = sum(
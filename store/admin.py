@@ -9,6 +9,8 @@ from import_export import resources
 from import_export.admin import ImportExportMixin
 from django.utils.safestring import mark_safe
 import admin_thumbnails
+from .catalog import bump_catalog_version, bump_product_versions
+from .utils import refresh_review_stats
 
 
 @admin_thumbnails.thumbnail('image')
@@ -117,11 +119,36 @@ class BrandAdmin(admin.ModelAdmin):
     logo_preview.short_description = 'Logo Preview'
 
 
+class ReviewRatingAdmin(admin.ModelAdmin):
+    list_display = ('product', 'user', 'subject', 'rating', 'status', 'created_at')
+    list_editable = ('status',)
+    list_filter = ('status', 'rating')
+    search_fields = ('product__product_name', 'subject', 'user__email')
+    actions = ('approve_reviews', 'hide_reviews')
+
+    def _set_status(self, queryset, status):
+        # queryset.update() skips post_save, so refresh the product aggregates explicitly
+        product_ids = set(queryset.values_list('product_id', flat=True))
+        queryset.update(status=status)
+        for product_id in product_ids:
+            refresh_review_stats(product_id)
+        bump_product_versions(product_ids)
+        bump_catalog_version()
+
+    def approve_reviews(self, request, queryset):
+        self._set_status(queryset, True)
+    approve_reviews.short_description = 'Approve selected reviews'
+
+    def hide_reviews(self, request, queryset):
+        self._set_status(queryset, False)
+    hide_reviews.short_description = 'Hide selected reviews'
+
+
 # Register models
 admin.site.register(Product, ProductAdmin)
 admin.site.register(VariationCategory, VariationCategoryAdmin)
 admin.site.register(Variation, VariationAdmin)
-admin.site.register(ReviewRating)
+admin.site.register(ReviewRating, ReviewRatingAdmin)
 admin.site.register(ProductGallery)
 admin.site.register(ProductDownload)
 admin.site.register(Brand, BrandAdmin)
\ No newline at end of file
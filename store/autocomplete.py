@@ -0,0 +1,91 @@
+"""
+Per-worker typeahead index.
+
+All suggestion keys (product names and their word suffixes, brand names,
+normalized part numbers) live in one sorted list; a prefix query is two
+bisects plus a short slice, so no database access happens per keystroke.
+The index is rebuilt lazily when store.catalog's version stamp moves.
+"""
+import bisect
+from django.urls import reverse
+
+from .catalog import WorkerCache
+from .codes import part_number_key
+from .models import Brand, Product
+
+MAX_RESULTS = 10
+MIN_QUERY_LENGTH = 2
+
+
+def _fold(text):
+    return ' '.join((text or '').lower().split())
+
+
+class PrefixIndex:
+    def __init__(self, entries):
+        # entries: iterable of (key, rank, suggestion dict); rank orders equal keys
+        entries = sorted(entries, key=lambda e: (e[0], e[1]))
+        self.keys = [e[0] for e in entries]
+        self.suggestions = [e[2] for e in entries]
+
+    def lookup(self, prefix, limit=MAX_RESULTS):
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', lo=start)
+        results, seen = [], set()
+        for i in range(start, end):
+            suggestion = self.suggestions[i]
+            if suggestion['url'] in seen:
+                continue
+            seen.add(suggestion['url'])
+            results.append(suggestion)
+            if len(results) >= limit:
+                break
+        return results
+
+
+def build_index():
+    entries = []
+    products = (
+        Product.objects.filter(is_available=True)
+        .values_list('id', 'product_name', 'slug', 'category__slug', 'part_number_key')
+    )
+    for product_id, name, slug, category_slug, part_key in products:
+        suggestion = {
+            'type': 'product',
+            'id': product_id,
+            'label': name,
+            'url': reverse('store:product_detail', args=[category_slug, slug]),
+        }
+        words = _fold(name).split(' ')
+        # Index every word-start suffix so "regulator" finds "Acme Regulator"
+        for position in range(len(words)):
+            entries.append((' '.join(words[position:]), 1 + position, suggestion))
+        if part_key:
+            entries.append((part_key.lower(), 0, dict(suggestion, type='part_number', code=part_key)))
+
+    for name, slug in Brand.objects.values_list('name', 'slug'):
+        suggestion = {
+            'type': 'brand',
+            'label': name,
+            'url': reverse('store:brand_detail', args=[slug]),
+        }
+        entries.append((_fold(name), 0, suggestion))
+    return PrefixIndex(entries)
+
+
+_index = WorkerCache(build_index)
+
+
+def suggest(query, limit=MAX_RESULTS):
+    folded = _fold(query)
+    if len(folded) < MIN_QUERY_LENGTH:
+        return []
+    index = _index.get()
+    results = index.lookup(folded, limit)
+    if len(results) < limit:
+        # "bd-162" should find BD16240 too
+        code = part_number_key(query)
+        if code and code.lower() != folded:
+            seen = {r['url'] for r in results}
+            results += [r for r in index.lookup(code.lower(), limit) if r['url'] not in seen]
+    return results[:limit]
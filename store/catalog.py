@@ -0,0 +1,147 @@
+"""
+Catalog version stamp.
+
+A single integer kept in Django's cache framework and bumped by store.signals
+whenever catalog data (products, brands, categories, variations...) changes.
+Per-worker structures (e.g. the autocomplete index) compare their build
+version against it to know when to rebuild; with a shared cache backend the
+bump is seen by every worker.
+
+Product detail bundles and variant matrices are cached the same way, stamped
+with a per-product version so one product's edits do not flush the rest of
+the catalog.
+
+Everything stamped here is built from the primary database: a read replica
+still behind the bump would otherwise be cached as the new version.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from estore.db.routers import primary
+from .detail import ProductDetailBundle
+from .variants import VariantMatrix
+
+CATALOG_VERSION_KEY = 'store:catalog_version'
+
+
+def _fresh_version():
+    # Time-based seed so a re-created key never repeats a version a worker already built
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """Current value of a version stamp kept in the shared cache."""
+    version = cache.get(key)
+    if version is None:
+        # add() so concurrent workers agree on the first value
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (evicted or never set): start a fresh sequence
+        version = _fresh_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+class WorkerCache:
+    """
+    A value built once per worker process and rebuilt lazily the first time
+    it is read after its version stamp (the catalog version by default) changes.
+    """
+
+    def __init__(self, builder, version=get_catalog_version):
+        self.builder = builder
+        self.get_version = version
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+
+    def get(self):
+        version = self.get_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    with primary():
+                        self._value = self.builder()
+                    self._version = version
+        return self._value
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+            self._version = None
+
+
+# --------------------------
+# Product detail bundles
+# --------------------------
+PRODUCT_BUNDLE_TIMEOUT = getattr(settings, 'STORE_PRODUCT_CACHE_TIMEOUT', 60 * 60)
+
+
+def _bundle_key(category_slug, product_slug):
+    return f'store:product_bundle:{category_slug}:{product_slug}'
+
+
+def _variant_matrix_key(product_id):
+    return f'store:variant_matrix:{product_id}'
+
+
+def _product_version_key(product_id):
+    return f'store:product_version:{product_id}'
+
+
+def get_product_version(product_id):
+    return get_version(_product_version_key(product_id))
+
+
+def bump_product_versions(product_ids):
+    for product_id in product_ids:
+        bump_version(_product_version_key(product_id))
+
+
+def get_product_bundle(category_slug, product_slug):
+    """
+    Read-through cache of everything product_detail shows that is the same
+    for every visitor. A cached bundle is served only while its stamp matches
+    the product's current version (bumped by store.signals).
+    """
+    key = _bundle_key(category_slug, product_slug)
+    bundle = cache.get(key)
+    if bundle is not None and bundle.version == get_product_version(bundle.product.pk):
+        return bundle
+    with primary():
+        bundle = ProductDetailBundle.load(category_slug, product_slug)
+    bundle.version = get_product_version(bundle.product.pk)
+    cache.set(key, bundle, PRODUCT_BUNDLE_TIMEOUT)
+    cache.set(_variant_matrix_key(bundle.product.pk), (bundle.version, bundle.variants), PRODUCT_BUNDLE_TIMEOUT)
+    return bundle
+
+
+def get_variant_matrix(product_id):
+    """Read-through cache of a product's VariantMatrix, stamped like the bundles."""
+    key = _variant_matrix_key(product_id)
+    version = get_product_version(product_id)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with primary():
+        matrix = VariantMatrix.load(product_id)
+    cache.set(key, (version, matrix), PRODUCT_BUNDLE_TIMEOUT)
+    return matrix
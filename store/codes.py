@@ -0,0 +1,46 @@
+"""
+Normalization helpers for product codes (manufacturer part numbers, GTIN/UPC/EAN).
+
+These are pure functions so Product.save(), migrations and lookups all share
+one definition of "the same code".
+"""
+import re
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+_NON_DIGIT = re.compile(r'\D')
+
+
+def part_number_key(value):
+    """
+    Upper-case and drop separators: "bd-16240", "BD 16240", "BD.16240" -> "BD16240".
+    """
+    if not value:
+        return None
+    key = _NON_ALNUM.sub('', str(value).upper())
+    return key or None
+
+
+def gtin_check_digit(digits):
+    """GS1 mod-10 check digit for a string of digits (without its check digit)."""
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        total += int(d) * (3 if i % 2 == 0 else 1)
+    return str((10 - total % 10) % 10)
+
+
+def gtin14(value):
+    """
+    Normalize a GTIN-8/12/13/14 (UPC-A, EAN-13, ...) to its 14-digit form.
+    Any 8-14 digit code whose check digit validates is zero-padded (so a UPC-A
+    that lost its leading zero still matches). Failing that, a 7 or 11 digit
+    code, which cannot be complete, is taken as missing its check digit.
+    Returns None when the value is not a GTIN.
+    """
+    if not value:
+        return None
+    digits = _NON_DIGIT.sub('', str(value))
+    if 8 <= len(digits) <= 14 and gtin_check_digit(digits[:-1]) == digits[-1]:
+        return digits.zfill(14)
+    if len(digits) in (7, 11):
+        return (digits + gtin_check_digit(digits)).zfill(14)
+    return None
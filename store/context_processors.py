@@ -1,9 +1,16 @@
-from .models import Product
+from .lazy import lazy_context
+from .models import ProductCard
+
+
+def _recently_viewed(viewed_ids):
+    if not viewed_ids:
+        return []
+    position = {pk: i for i, pk in enumerate(viewed_ids)}
+    cards = ProductCard.objects.filter(product_id__in=viewed_ids, is_available=True)
+    # Session order is most recent first
+    return sorted(cards, key=lambda card: position[card.product_id])[:5]
+
 
 def recently_viewed(request):
     viewed_ids = request.session.get('viewed_products', [])
-    # Fetch products, preserving order (most recent first), exclude unavailable
-    recently_viewed = Product.objects.filter(id__in=viewed_ids, is_available=True).order_by('-modified_date')[:5]  # Limit to 5, match session order if possible
-    # To preserve exact session order (since order_by might not match)
-    ordered_products = sorted(recently_viewed, key=lambda p: viewed_ids.index(p.id) if p.id in viewed_ids else len(viewed_ids))
-    return {'recently_viewed': ordered_products}
\ No newline at end of file
+    return {'recently_viewed': lazy_context(request, 'recently_viewed', _recently_viewed, viewed_ids)}
@@ -0,0 +1,80 @@
+"""
+Product detail page loading.
+
+ProductDetailBundle fetches everything on the page that is the same for all
+visitors in a fixed number of queries (product + 3 prefetches + the variant
+matrix), whatever the number of variations, reviews, images or downloads. viewer_flags() adds the
+per-visitor booleans the template needs, precomputed in the view instead of
+lazily in the template.
+"""
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+
+from carts.models import CartItem
+from carts.utils import _cart_id, session_cart, uses_session_cart
+from orders.models import OrderProduct
+from .models import Product, ReviewRating, Wishlist
+from .variants import VariantMatrix
+
+
+class ProductDetailBundle:
+    QUERY_COUNT = 5
+
+    def __init__(self, product):
+        self.product = product
+        self.variants = None
+        self.version = None
+
+    @classmethod
+    def load(cls, category_slug, product_slug):
+        queryset = Product.objects.select_related('category', 'brand').prefetch_related(
+            Prefetch(
+                'reviewrating_set',
+                # Only the reviewer's name is kept, never the whole account row (bundles are cached)
+                queryset=ReviewRating.objects.filter(status=True).select_related('user').only(
+                    'product', 'subject', 'review', 'rating', 'updated_at', 'user__first_name', 'user__last_name',
+                ),
+                to_attr='approved_reviews',
+            ),
+            Prefetch('productgallery_set', to_attr='gallery'),
+            Prefetch('downloads', to_attr='download_list'),
+        )
+        product = get_object_or_404(queryset, category__slug=category_slug, slug=product_slug)
+        bundle = cls(product)
+        bundle.variants = VariantMatrix.load(product.pk)
+        return bundle
+
+    @property
+    def reviews(self):
+        return self.product.approved_reviews
+
+    @property
+    def product_gallery(self):
+        return self.product.gallery
+
+    @property
+    def product_downloads(self):
+        return self.product.download_list
+
+    @property
+    def variation_data(self):
+        return self.variants.grouped()
+
+
+def viewer_flags(request, product):
+    """Cart / wishlist / purchase flags for the current visitor (at most three EXISTS queries)."""
+    if request.user.is_authenticated:
+        return {
+            'in_cart': CartItem.objects.filter(user=request.user, product=product).exists(),
+            'in_wishlist': Wishlist.objects.filter(user=request.user, product=product).exists(),
+            'orderproduct': OrderProduct.objects.filter(user=request.user, product=product).exists(),
+        }
+    if uses_session_cart(request):
+        in_cart = any(line[0] == product.pk for line in session_cart(request).snapshot().values())
+    else:
+        in_cart = CartItem.objects.filter(cart__cart_id=_cart_id(request), product=product).exists()
+    return {
+        'in_cart': in_cart,
+        'in_wishlist': False,
+        'orderproduct': None,
+    }
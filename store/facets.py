@@ -0,0 +1,226 @@
+"""
+Faceted catalog filtering.
+
+A per-worker bitmap index (one Python int per facet value, bit i = i-th
+available product by id) is built from two queries and rebuilt when the
+catalog version changes. Filtering and every facet count are then bitwise
+AND/OR + popcount, with no COUNT(*) per facet per request.
+
+Facet state lives in the query string:
+    ?category=<slug>&brand=<slug>&price=50-100&in_stock=1&rating=4&option=Color:Red
+Values inside one facet are OR-ed, different facets are AND-ed. ?sort= picks
+one of SORTS; page_after() serves keyset pages over the same index.
+"""
+import bisect
+from collections import OrderedDict
+from decimal import Decimal
+
+from .catalog import WorkerCache
+from .models import Product, Variation
+
+PRICE_BANDS = (
+    ('0-50', 'Under $50', Decimal('0'), Decimal('50')),
+    ('50-100', '$50 to $100', Decimal('50'), Decimal('100')),
+    ('100-250', '$100 to $250', Decimal('100'), Decimal('250')),
+    ('250-500', '$250 to $500', Decimal('250'), Decimal('500')),
+    ('500-1000', '$500 to $1000', Decimal('500'), Decimal('1000')),
+    ('1000-', '$1000 & up', Decimal('1000'), None),
+)
+
+RATING_BANDS = (
+    ('4', '4 stars & up', 4),
+    ('3', '3 stars & up', 3),
+    ('2', '2 stars & up', 2),
+    ('1', '1 star & up', 1),
+)
+
+OPTION_PARAM = 'option'
+
+# sort param -> (label, key function over (price, created_date, product_name)); ties break on id
+SORTS = OrderedDict((
+    ('', ('Featured', lambda price, created, name: 0)),
+    ('newest', ('Newest', lambda price, created, name: -int(created.timestamp() * 1000000))),
+    ('price', ('Price: low to high', lambda price, created, name: int(price * 100))),
+    ('-price', ('Price: high to low', lambda price, created, name: -int(price * 100))),
+    ('name', ('Name', lambda price, created, name: name.casefold())),
+))
+
+
+def _bits(mask):
+    """Positions of the set bits, ascending."""
+    return [i for i, bit in enumerate(bin(mask)[:1:-1]) if bit == '1']
+
+
+class FacetIndex:
+    def __init__(self, products, variations):
+        # products: rows of (id, category slug, category name, brand slug, brand name, price, stock, rating,
+        #                    created_date, product_name)
+        products = sorted(products)
+        self.ids = [row[0] for row in products]
+        position = {pk: i for i, pk in enumerate(self.ids)}
+        self.all = (1 << len(self.ids)) - 1
+        # group -> OrderedDict(value -> [label, mask]); group order is display order
+        self.groups = OrderedDict((g, OrderedDict()) for g in ('category', 'brand', 'price', 'in_stock', 'rating'))
+        self.titles = {'category': 'Categories', 'brand': 'Brands', 'price': 'Price',
+                       'in_stock': 'Availability', 'rating': 'Customer rating'}
+
+        for label_key, label, *_ in PRICE_BANDS:
+            self.groups['price'][label_key] = [label, 0]
+        self.groups['in_stock']['1'] = ['In stock', 0]
+        for key, label, _ in RATING_BANDS:
+            self.groups['rating'][key] = [label, 0]
+
+        # sort -> [(key, id, position)] in (key, id) order, for ordering and keyset lookups
+        self.sorted = {
+            sort: sorted((key(row[5], row[8], row[9]), row[0], position[row[0]]) for row in products)
+            for sort, (_, key) in SORTS.items()
+        }
+
+        for pk, category_slug, category_name, brand_slug, brand_name, price, stock, rating, *_ in products:
+            bit = 1 << position[pk]
+            self._add('category', category_slug, category_name, bit)
+            if brand_slug:
+                self._add('brand', brand_slug, brand_name, bit)
+            for key, _, low, high in PRICE_BANDS:
+                if price >= low and (high is None or price < high):
+                    self.groups['price'][key][1] |= bit
+                    break
+            if stock > 0:
+                self.groups['in_stock']['1'][1] |= bit
+            for key, _, minimum in RATING_BANDS:
+                if rating >= minimum:
+                    self.groups['rating'][key][1] |= bit
+
+        for product_id, option_category, option_value in sorted(variations, key=lambda v: (v[1], v[2])):
+            if product_id not in position:
+                continue
+            group = f'{OPTION_PARAM}:{option_category}'
+            if group not in self.groups:
+                self.groups[group] = OrderedDict()
+                self.titles[group] = option_category
+            self._add(group, f'{option_category}:{option_value}', option_value, 1 << position[product_id])
+
+    def _add(self, group, value, label, bit):
+        entry = self.groups[group].setdefault(value, [label, 0])
+        entry[1] |= bit
+
+    @staticmethod
+    def param(group):
+        return group.split(':', 1)[0]
+
+    def parse(self, querydict):
+        """Selected values per group from request.GET, ignoring unknown values."""
+        selected = {}
+        for group, values in self.groups.items():
+            param = self.param(group)
+            chosen = {v for v in querydict.getlist(param) if v in values}
+            if chosen:
+                selected[group] = chosen
+        return selected
+
+    def _mask(self, selected, skip=None):
+        mask = self.all
+        for group, chosen in selected.items():
+            if group == skip:
+                continue
+            union = 0
+            for value in chosen:
+                union |= self.groups[group].get(value, (None, 0))[1]
+            mask &= union
+        return mask
+
+    def count(self, selected):
+        return self._mask(selected).bit_count()
+
+    def product_ids(self, selected, sort=''):
+        positions = _bits(self._mask(selected))
+        if not sort:
+            return [self.ids[i] for i in positions]
+        wanted = set(positions)
+        return [pk for _, pk, position in self.sorted[sort] if position in wanted]
+
+    def page_after(self, selected, sort='', cursor=None, limit=12):
+        """
+        Keyset page: up to `limit` ids strictly after `cursor` = (sort key, id),
+        plus the cursor for the following page (None on the last page).
+        """
+        entries = self.sorted[sort]
+        mask = self._mask(selected)
+        wanted = None if mask == self.all else set(_bits(mask))
+        start = 0
+        if cursor is not None and entries and type(cursor[0]) is not type(entries[0][0]):
+            # A key of another sort's type cannot be compared: restart from the top
+            cursor = None
+        if cursor is not None:
+            start = bisect.bisect_right(entries, (cursor[0], cursor[1], len(self.ids)))
+        ids, last = [], None
+        for i in range(start, len(entries)):
+            key, pk, position = entries[i]
+            if wanted is None or position in wanted:
+                if len(ids) == limit:
+                    return ids, last
+                ids.append(pk)
+                last = (key, pk)
+        return ids, None
+
+    def facets(self, selected, querydict, fixed=()):
+        """
+        Display data: for each group, its values with the live count given every
+        other selected facet, and the query string that toggles the value.
+        Groups listed in `fixed` come from the URL path and are not rendered.
+        """
+        result = []
+        for group, values in self.groups.items():
+            if group in fixed:
+                continue
+            others = self._mask(selected, skip=group)
+            chosen = selected.get(group, set())
+            entries = []
+            for value, (label, mask) in values.items():
+                count = (others & mask).bit_count()
+                if not count and value not in chosen:
+                    continue
+                entries.append({
+                    'value': value,
+                    'label': label,
+                    'count': count,
+                    'selected': value in chosen,
+                    'query': _toggle(querydict, self.param(group), value),
+                })
+            if entries:
+                result.append({'group': group, 'title': self.titles[group], 'values': entries})
+        return result
+
+
+def _toggle(querydict, param, value):
+    params = querydict.copy()
+    params.pop('page', None)
+    params.pop('cursor', None)
+    values = params.getlist(param)
+    if value in values:
+        values.remove(value)
+    else:
+        values.append(value)
+    params.setlist(param, values)
+    return params.urlencode()
+
+
+def build_index():
+    products = Product.objects.filter(is_available=True).values_list(
+        'id', 'category__slug', 'category__category_name', 'brand__slug', 'brand__name',
+        'price', 'stock', 'rating_average', 'created_date', 'product_name',
+    )
+    variations = (
+        Variation.objects.filter(is_active=True, product__is_available=True, category__isnull=False)
+        .exclude(name__isnull=True).exclude(name='')
+        .values_list('product_id', 'category__name', 'name')
+        .distinct()
+    )
+    return FacetIndex(list(products), list(variations))
+
+
+_index = WorkerCache(build_index)
+
+
+def get_index():
+    return _index.get()
@@ -0,0 +1,28 @@
+"""
+Lazy, timed template context values.
+
+Context processors run on every render(), including emails and fragments
+that never show the navbar. Wrapping a value in lazy_context() defers its
+queries until a template first touches it (truthiness, iteration, output),
+and records how long that evaluation took: on request.context_timings and
+as a DEBUG line on the 'store.lazy' logger.
+"""
+import logging
+import time
+
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+
+def lazy_context(request, name, func, *args):
+    def evaluate():
+        started = time.perf_counter()
+        value = func(*args)
+        elapsed = (time.perf_counter() - started) * 1000
+        if not hasattr(request, 'context_timings'):
+            request.context_timings = {}
+        request.context_timings[name] = elapsed
+        logger.debug('context value %s evaluated in %.2f ms (%s)', name, elapsed, request.path)
+        return value
+    return SimpleLazyObject(evaluate)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.utils import backfill_code_keys
+
+
+class Command(BaseCommand):
+    help = 'Recompute the normalized part-number and GTIN-14 lookup keys for every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products read per batch')
+
+    def handle(self, *args, **options):
+        changed = backfill_code_keys(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated code keys on {changed} products."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.utils import refresh_product_cards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized ProductCard rows used by catalog listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Cards upserted per batch')
+
+    def handle(self, *args, **options):
+        written = refresh_product_cards(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} product cards."))
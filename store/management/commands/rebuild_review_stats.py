@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.utils import rebuild_review_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating average, count and star histogram for every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products written per bulk update')
+
+    def handle(self, *args, **options):
+        updated = rebuild_review_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Review stats rebuilt for {updated} products."))
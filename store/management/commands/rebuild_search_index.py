@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from store import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index (FTS5 on SQLite, tsvector on Postgres)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products indexed per batch')
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend.name == 'basic':
+            self.stdout.write(self.style.WARNING('No full-text index available on this database; search uses icontains.'))
+            return
+        indexed = search.index_products(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products with the {backend.name} backend."))
@@ -0,0 +1,49 @@
+# Generated by Django 5.0 on 2026-10-18 03:05
+
+import math
+
+from django.db import migrations, models
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ReviewRating = apps.get_model('store', 'ReviewRating')
+    stats = {}
+    for product_id, rating in ReviewRating.objects.filter(status=True).values_list('product_id', 'rating'):
+        entry = stats.setdefault(product_id, {'total': 0.0, 'count': 0, 'histogram': {str(s): 0 for s in range(1, 6)}})
+        entry['total'] += rating
+        entry['count'] += 1
+        star = min(max(math.ceil(rating), 1), 5)
+        entry['histogram'][str(star)] += 1
+    for product_id, entry in stats.items():
+        Product.objects.filter(pk=product_id).update(
+            rating_average=round(entry['total'] / entry['count'], 2),
+            rating_count=entry['count'],
+            rating_histogram=entry['histogram'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_product_height_in_product_length_in_product_width_in'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_average',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text="Approved review count per star, keyed '1'..'5'."),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts USING fts5("
+                    "product_name, description, brand, codes, tokenize='unicode61 remove_diacritics 2')"
+                )
+            except Exception:
+                # SQLite built without FTS5: store.search falls back to the basic backend
+                return
+            cursor.execute(
+                "INSERT INTO store_product_fts (rowid, product_name, description, brand, codes) "
+                "SELECT p.id, p.product_name, p.description, COALESCE(b.name, ''), "
+                "TRIM(COALESCE(p.manufacturer_part_number, '') || ' ' || COALESCE(p.gtin, '') || ' ' || COALESCE(p.upc_ean, '')) "
+                "FROM store_product p LEFT JOIN store_brand b ON b.id = p.brand_id"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS store_product_search ("
+                "product_id bigint PRIMARY KEY REFERENCES store_product(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS store_product_search_document_gin "
+                "ON store_product_search USING GIN (document)"
+            )
+            cursor.execute(
+                "INSERT INTO store_product_search (product_id, document) "
+                "SELECT p.id, "
+                "setweight(to_tsvector('simple', p.product_name), 'A') || "
+                "setweight(to_tsvector('simple', concat_ws(' ', p.manufacturer_part_number, p.gtin, p.upc_ean)), 'A') || "
+                "setweight(to_tsvector('simple', COALESCE(b.name, '')), 'B') || "
+                "setweight(to_tsvector('simple', p.description), 'C') "
+                "FROM store_product p LEFT JOIN store_brand b ON b.id = p.brand_id "
+                "ON CONFLICT (product_id) DO NOTHING"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("DROP TABLE IF EXISTS store_product_fts")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP TABLE IF EXISTS store_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_product_rating_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
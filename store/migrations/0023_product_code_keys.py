@@ -0,0 +1,60 @@
+# Generated by Django 5.0 on 2026-10-18 03:07
+
+import re
+
+from django.db import migrations, models
+
+
+# Frozen copies of store.codes.part_number_key and store.codes.gtin14 as of this migration
+
+def _part_number_key(value):
+    if not value:
+        return None
+    key = re.sub(r'[^0-9A-Z]', '', str(value).upper())
+    return key or None
+
+
+def _check_digit(digits):
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits)))
+    return str((10 - total % 10) % 10)
+
+
+def _gtin14(value):
+    if not value:
+        return None
+    digits = re.sub(r'\D', '', str(value))
+    if 8 <= len(digits) <= 14 and _check_digit(digits[:-1]) == digits[-1]:
+        return digits.zfill(14)
+    if len(digits) in (7, 11):
+        return (digits + _check_digit(digits)).zfill(14)
+    return None
+
+
+def backfill_code_keys(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.only('id', 'manufacturer_part_number', 'gtin', 'upc_ean'))
+    for product in products:
+        product.part_number_key = _part_number_key(product.manufacturer_part_number)
+        product.gtin_key = _gtin14(product.gtin) or _gtin14(product.upc_ean)
+    Product.objects.bulk_update(products, ['part_number_key', 'gtin_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='gtin_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='GTIN-14 form of gtin, or of upc_ean when gtin is empty.', max_length=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='part_number_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50, null=True),
+        ),
+        migrations.RunPython(backfill_code_keys, migrations.RunPython.noop),
+    ]
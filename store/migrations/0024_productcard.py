@@ -0,0 +1,61 @@
+# Generated by Django 5.0 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.urls import reverse
+
+
+def backfill_product_cards(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductCard = apps.get_model('store', 'ProductCard')
+    cards = []
+    for product in Product.objects.select_related('category', 'brand').iterator():
+        cards.append(ProductCard(
+            product_id=product.pk,
+            product_name=product.product_name,
+            url=reverse('store:product_detail', args=[product.category.slug, product.slug]),
+            thumbnail_url=default_storage.url(product.images.name) if product.images else '',
+            price=product.price,
+            in_stock=product.stock > 0,
+            is_available=product.is_available,
+            has_variants=product.has_variants,
+            category_slug=product.category.slug,
+            brand_slug=product.brand.slug if product.brand_id else '',
+            rating_average=product.rating_average,
+            rating_count=product.rating_count,
+            created_date=product.created_date,
+        ))
+    ProductCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_product_code_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='store.product')),
+                ('product_name', models.CharField(max_length=200)),
+                ('url', models.CharField(max_length=255)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('in_stock', models.BooleanField(default=True)),
+                ('is_available', models.BooleanField(default=True)),
+                ('has_variants', models.BooleanField(default=False)),
+                ('category_slug', models.SlugField(max_length=100)),
+                ('brand_slug', models.SlugField(blank=True, max_length=200)),
+                ('rating_average', models.FloatField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('created_date', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_available', '-created_date'], name='store_produ_is_avai_e99624_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_product_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0 on 2026-10-18 03:18
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _signature(variation_ids):
+    # Frozen copy of store.variants.variation_signature as of this migration
+    ids = sorted({int(pk) for pk in variation_ids})
+    if not ids:
+        return ''
+    return hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()
+
+
+def backfill_signatures(apps, schema_editor):
+    Wishlist = apps.get_model('store', 'Wishlist')
+    selected = {}
+    for line_id, variation_id in Wishlist.variations.through.objects.values_list('wishlist_id', 'variation_id'):
+        selected.setdefault(line_id, []).append(variation_id)
+
+    kept, duplicates, changed = {}, [], []
+    for line in Wishlist.objects.order_by('id'):
+        line.variation_signature = _signature(selected.get(line.id, ()))
+        key = (line.user_id, line.product_id, line.variation_signature)
+        if key in kept:
+            # Same product and variations listed twice: keep the oldest line
+            duplicates.append(line.id)
+        else:
+            kept[key] = line
+            changed.append(line)
+    Wishlist.objects.filter(id__in=duplicates).delete()
+    Wishlist.objects.bulk_update(changed, ['variation_signature'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0024_productcard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='variation_signature',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wishlist',
+            constraint=models.UniqueConstraint(fields=('user', 'product', 'variation_signature'), name='wishlist_unique_line'),
+        ),
+    ]
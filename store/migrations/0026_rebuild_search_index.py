@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+def _document(product):
+    # Frozen copy of store.search._document as of this migration
+    codes = ' '.join(
+        c for c in (product.manufacturer_part_number, product.part_number_key, product.gtin, product.upc_ean) if c
+    )
+    return {
+        'product_name': product.product_name or '',
+        'description': product.description or '',
+        'brand': product.brand.name if product.brand_id else '',
+        'codes': codes,
+    }
+
+
+def rebuild_search_index(apps, schema_editor):
+    """
+    0022 filled the index before part_number_key existed and 0023 backfilled
+    the keys without reindexing: rebuild every row the way store.search does.
+    """
+    connection = schema_editor.connection
+    Product = apps.get_model('store', 'Product')
+    products = Product.objects.select_related('brand').order_by('pk')
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            if 'store_product_fts' not in connection.introspection.table_names(cursor):
+                return  # SQLite without FTS5: nothing was indexed
+            cursor.execute("DELETE FROM store_product_fts")
+            rows = [
+                (product.pk, doc['product_name'], doc['description'], doc['brand'], doc['codes'])
+                for product in products for doc in [_document(product)]
+            ]
+            cursor.executemany(
+                "INSERT INTO store_product_fts (rowid, product_name, description, brand, codes) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+        elif connection.vendor == 'postgresql':
+            rows = [
+                (product.pk, doc['product_name'], doc['codes'], doc['brand'], doc['description'])
+                for product in products for doc in [_document(product)]
+            ]
+            cursor.executemany(
+                "INSERT INTO store_product_search (product_id, document) VALUES ("
+                "%s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C')) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0025_wishlist_variation_signature'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
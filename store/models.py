@@ -1,7 +1,7 @@
 from django.db import models
-from django.db.models import Avg, Count
 from django.urls import reverse
 from accounts.models import Account
+from . import codes
 
 # -------------------------
 # Brand
@@ -59,6 +59,16 @@ class Product(models.Model):
         default=6,
         help_text="Package height in inches (whole numbers only)."
     )
+    # Normalized lookup keys, maintained in save() (see store.codes)
+    part_number_key = models.CharField(max_length=50, blank=True, null=True, db_index=True, editable=False)
+    gtin_key = models.CharField(max_length=14, blank=True, null=True, db_index=True, editable=False,
+                                help_text="GTIN-14 form of gtin, or of upc_ean when gtin is empty.")
+    # Denormalized review summary, maintained by store.signals / store.utils
+    rating_average = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_histogram = models.JSONField(default=dict, blank=True, editable=False,
+                                        help_text="Approved review count per star, keyed '1'..'5'.")
+    RATING_FIELDS = ('rating_average', 'rating_count', 'rating_histogram')
 
     def save(self, *args, **kwargs):
         """
@@ -77,6 +87,19 @@ class Product(models.Model):
                 setattr(self, field, 1)
             else:
                 setattr(self, field, int(value + 0.9999))
+
+        self.part_number_key = codes.part_number_key(self.manufacturer_part_number)
+        self.gtin_key = codes.gtin14(self.gtin) or codes.gtin14(self.upc_ean)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'manufacturer_part_number', 'gtin', 'upc_ean'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'part_number_key', 'gtin_key'}
+        elif update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # The rating columns are written only by store.utils: saving an instance
+            # loaded before a review arrived must not put its old numbers back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def get_url(self):
@@ -86,18 +109,13 @@ class Product(models.Model):
         return self.product_name
 
     def averageReview(self):
-        reviews = ReviewRating.objects.filter(product=self, status=True).aggregate(average=Avg('rating'))
-        avg = 0
-        if reviews['average'] is not None:
-            avg = float(reviews['average'])
-        return avg
+        """
+        Average of approved reviews, read from the denormalized column (no query).
+        """
+        return float(self.rating_average or 0)
 
     def countReview(self):
-        reviews = ReviewRating.objects.filter(product=self, status=True).aggregate(count=Count('id'))
-        count = 0
-        if reviews['count'] is not None:
-            count = int(reviews['count'])
-        return count
+        return int(self.rating_count or 0)
 
 
 # -------------------------
@@ -184,6 +202,8 @@ class Wishlist(models.Model):
     variations = models.ManyToManyField(Variation, blank=True)
     added_date = models.DateTimeField(auto_now_add=True)
     quantity = models.PositiveIntegerField(default=1)  # New field for quantity
+    # store.variants.variation_signature() of `variations`
+    variation_signature = models.CharField(max_length=40, blank=True, default='', editable=False)
 
     def __str__(self):
         variant_values = ", ".join([f"{v.category}: {v.name}" for v in self.variations.all()])
@@ -193,4 +213,50 @@ class Wishlist(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['user', 'product']),
-        ]
\ No newline at end of file
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product', 'variation_signature'], name='wishlist_unique_line'),
+        ]
+
+# -------------------------
+# Product card (listing read model)
+# -------------------------
+class ProductCard(models.Model):
+    """
+    Denormalized copy of what a product card in a listing needs, so a page of
+    cards is one query. Maintained by store.signals / store.utils.refresh_product_cards.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    product_name = models.CharField(max_length=200)
+    url = models.CharField(max_length=255)
+    thumbnail_url = models.CharField(max_length=255, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    in_stock = models.BooleanField(default=True)
+    is_available = models.BooleanField(default=True)
+    has_variants = models.BooleanField(default=False)
+    category_slug = models.SlugField(max_length=100)
+    brand_slug = models.SlugField(max_length=200, blank=True)
+    rating_average = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    created_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_available', '-created_date']),
+        ]
+
+    @property
+    def id(self):
+        return self.product_id
+
+    def get_url(self):
+        return self.url
+
+    def averageReview(self):
+        return float(self.rating_average or 0)
+
+    def countReview(self):
+        return int(self.rating_count or 0)
+
+    def __str__(self):
+        return self.product_name
@@ -0,0 +1,57 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the signed (sort key, id) pair of the last row already shown,
+tagged with the ordering that produced it;
+the next page is "rows strictly after it in (sort key, id) order", so its
+cost does not grow with depth the way OFFSET does.
+"""
+from django.core import signing
+
+CURSOR_SALT = 'store.cursor'
+
+
+def encode_cursor(values, kind):
+    """
+    Sign the (sort key, id) pair together with `kind`, the ordering it comes
+    from (e.g. "listing:price" or "search:fts5"): sort keys of different
+    orderings have different types and are not comparable.
+    """
+    return signing.dumps([kind, *values], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, kind):
+    """
+    The (sort key, id) tuple in a cursor token, or None if missing, tampered
+    with or issued for another ordering (the page then restarts from the top).
+    """
+    if not token:
+        return None
+    try:
+        values = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(values, list) or len(values) != 3 or values[0] != kind:
+        return None
+    key, pk = values[1], values[2]
+    if not isinstance(key, (int, float, str)) or isinstance(key, bool) or not isinstance(pk, int):
+        return None
+    return key, pk
+
+
+class CursorPage:
+    """One keyset page; `total` may be exact, cached or None."""
+
+    def __init__(self, object_list, next_cursor=None, total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
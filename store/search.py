@@ -0,0 +1,441 @@
+"""
+Full-text product search.
+
+The index lives in a side table maintained by store.signals and the
+rebuild_search_index command:
+  * SQLite   -> FTS5 virtual table ``store_product_fts`` (rowid = product id)
+  * Postgres -> ``store_product_search`` with a weighted tsvector + GIN index
+Other vendors (or SQLite builds without FTS5) fall back to icontains.
+
+Pick a backend explicitly with settings.STORE_SEARCH_BACKEND
+('fts5', 'postgres' or 'basic'); by default it follows the DB vendor.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from estore.db.routers import primary
+from . import codes
+from .catalog import get_catalog_version
+from .models import Product
+from .utils import cards_in_order
+
+FTS5_TABLE = 'store_product_fts'
+PG_TABLE = 'store_product_search'
+
+COUNT_CACHE_SECONDS = 300
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(keyword):
+    return _TOKEN_RE.findall(keyword or '')[:10]
+
+
+def _document(product):
+    """Text fields indexed for one product (brand must be select_related)."""
+    codes = ' '.join(
+        c for c in (product.manufacturer_part_number, product.part_number_key, product.gtin, product.upc_ean) if c
+    )
+    return {
+        'product_name': product.product_name or '',
+        'description': product.description or '',
+        'brand': product.brand.name if product.brand_id else '',
+        'codes': codes,
+    }
+
+
+def _indexable(product_ids=None):
+    qs = Product.objects.select_related('brand').only(
+        'id', 'product_name', 'description', 'manufacturer_part_number', 'part_number_key', 'gtin', 'upc_ean',
+        'brand__name',
+    )
+    if product_ids is not None:
+        qs = qs.filter(pk__in=product_ids)
+    return qs
+
+
+# --------------------------
+# Backends
+# --------------------------
+class BasicSearchBackend:
+    """Unindexed icontains scan; used when no full-text engine is available."""
+    name = 'basic'
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def _queryset(self, keyword):
+        query = Q()
+        for token in _tokens(keyword):
+            query &= (
+                Q(product_name__icontains=token) | Q(description__icontains=token) |
+                Q(brand__name__icontains=token) | Q(manufacturer_part_number__icontains=token) |
+                Q(gtin__icontains=token) | Q(upc_ean__icontains=token)
+            )
+        return Product.objects.filter(query)
+
+    def search(self, keyword, offset, limit):
+        qs = self._queryset(keyword).order_by('-created_date').values_list('id', flat=True)
+        return list(qs[offset:offset + limit])
+
+    def search_after(self, keyword, after, limit):
+        # Newest first; score = -id keeps the shared "ascending score" contract
+        qs = self._queryset(keyword)
+        if after is not None:
+            qs = qs.filter(id__lt=-after[0])
+        return [(pk, -pk) for pk in qs.order_by('-id').values_list('id', flat=True)[:limit]]
+
+    def count(self, keyword):
+        return self._queryset(keyword).count()
+
+
+class FTS5SearchBackend:
+    name = 'fts5'
+    # bm25 column weights: product_name, description, brand, codes
+    weights = (10.0, 1.0, 4.0, 8.0)
+
+    def _match(self, keyword):
+        tokens = _tokens(keyword)
+        if not tokens:
+            return None
+        # Quote each token (no FTS syntax injection) and prefix-match it
+        return ' '.join('"%s"*' % t.replace('"', '') for t in tokens)
+
+    def index(self, products):
+        rows = []
+        ids = []
+        for product in products:
+            doc = _document(product)
+            ids.append(product.pk)
+            rows.append((product.pk, doc['product_name'], doc['description'], doc['brand'], doc['codes']))
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            self._delete(cursor, ids)
+            cursor.executemany(
+                f'INSERT INTO {FTS5_TABLE} (rowid, product_name, description, brand, codes) VALUES (%s, %s, %s, %s, %s)',
+                rows,
+            )
+
+    def _delete(self, cursor, product_ids):
+        for start in range(0, len(product_ids), 500):
+            chunk = product_ids[start:start + 500]
+            cursor.execute(
+                f'DELETE FROM {FTS5_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(chunk))})', chunk,
+            )
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, list(product_ids))
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS5_TABLE}')
+
+    def search(self, keyword, offset, limit):
+        match = self._match(keyword)
+        if match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS5_TABLE} WHERE {FTS5_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS5_TABLE}, %s, %s, %s, %s), rowid LIMIT %s OFFSET %s',
+                [match, *self.weights, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_after(self, keyword, after, limit):
+        match = self._match(keyword)
+        if match is None:
+            return []
+        params = [*self.weights, match]
+        where = ''
+        if after is not None:
+            where = 'WHERE score > %s OR (score = %s AND rowid > %s)'
+            params += [after[0], after[0], after[1]]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, score FROM ('
+                f'SELECT rowid, bm25({FTS5_TABLE}, %s, %s, %s, %s) AS score FROM {FTS5_TABLE} '
+                f'WHERE {FTS5_TABLE} MATCH %s) {where} ORDER BY score, rowid LIMIT %s',
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+    def count(self, keyword):
+        match = self._match(keyword)
+        if match is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS5_TABLE} WHERE {FTS5_TABLE} MATCH %s', [match])
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend:
+    name = 'postgres'
+    # 'simple' config keeps part numbers and brand names unstemmed and makes prefix queries predictable
+    config = 'simple'
+
+    def _tsquery(self, keyword):
+        tokens = _tokens(keyword)
+        if not tokens:
+            return None
+        return ' & '.join(f'{t}:*' for t in tokens)
+
+    def index(self, products):
+        rows = []
+        for product in products:
+            doc = _document(product)
+            rows.append((product.pk, doc['product_name'], doc['codes'], doc['brand'], doc['description']))
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"""
+                INSERT INTO {PG_TABLE} (product_id, document) VALUES (
+                    %s,
+                    setweight(to_tsvector('{self.config}', %s), 'A') ||
+                    setweight(to_tsvector('{self.config}', %s), 'A') ||
+                    setweight(to_tsvector('{self.config}', %s), 'B') ||
+                    setweight(to_tsvector('{self.config}', %s), 'C')
+                )
+                ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                rows,
+            )
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {PG_TABLE} WHERE product_id = ANY(%s)', [list(product_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {PG_TABLE}')
+
+    def search(self, keyword, offset, limit):
+        tsquery = self._tsquery(keyword)
+        if tsquery is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT product_id FROM {PG_TABLE}, to_tsquery('{self.config}', %s) AS q
+                WHERE document @@ q
+                ORDER BY ts_rank_cd(document, q) DESC, product_id
+                LIMIT %s OFFSET %s
+                """,
+                [tsquery, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_after(self, keyword, after, limit):
+        tsquery = self._tsquery(keyword)
+        if tsquery is None:
+            return []
+        params = [tsquery]
+        where = ''
+        if after is not None:
+            where = 'WHERE score > %s OR (score = %s AND product_id > %s)'
+            params += [after[0], after[0], after[1]]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT product_id, score FROM (
+                    SELECT product_id, -ts_rank_cd(document, q)::float8 AS score
+                    FROM {PG_TABLE}, to_tsquery('{self.config}', %s) AS q
+                    WHERE document @@ q
+                ) ranked
+                {where}
+                ORDER BY score, product_id
+                LIMIT %s
+                """,
+                params + [limit],
+            )
+            return cursor.fetchall()
+
+    def count(self, keyword):
+        tsquery = self._tsquery(keyword)
+        if tsquery is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {PG_TABLE} WHERE document @@ to_tsquery('{self.config}', %s)", [tsquery],
+            )
+            return cursor.fetchone()[0]
+
+
+BACKENDS = {
+    'basic': BasicSearchBackend,
+    'fts5': FTS5SearchBackend,
+    'postgres': PostgresSearchBackend,
+}
+
+
+_fts5_available = None
+
+
+def fts5_available():
+    """Whether the FTS5 table exists; checked once per process."""
+    global _fts5_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts5_available is None:
+        _fts5_available = FTS5_TABLE in connection.introspection.table_names()
+    return _fts5_available
+
+
+def get_backend():
+    name = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+    if name is None:
+        if connection.vendor == 'postgresql':
+            name = 'postgres'
+        elif fts5_available():
+            name = 'fts5'
+        else:
+            name = 'basic'
+    return BACKENDS[name]()
+
+
+# --------------------------
+# Exact code lookups
+# --------------------------
+def _code_filter(values):
+    """
+    Q matching any of the given raw codes against the indexed key columns,
+    plus the {raw: (part_number_key, gtin_key)} mapping used to read results back.
+    """
+    keys = {raw: (codes.part_number_key(raw), codes.gtin14(raw)) for raw in values}
+    part_keys = {pk for pk, _ in keys.values() if pk}
+    gtin_keys = {gk for _, gk in keys.values() if gk}
+    if not part_keys and not gtin_keys:
+        return None, keys
+    return Q(part_number_key__in=part_keys) | Q(gtin_key__in=gtin_keys), keys
+
+
+def resolve_codes(values, queryset=None):
+    """
+    Resolve many pasted codes (MPN, GTIN, UPC/EAN in any format) in one indexed query.
+    Returns {raw_value: Product}; unmatched values are absent.
+    """
+    values = [v for v in values if v]
+    query, keys = _code_filter(values)
+    if query is None:
+        return {}
+    qs = queryset if queryset is not None else Product.objects.all()
+    by_part, by_gtin = {}, {}
+    for product in qs.filter(query):
+        if product.part_number_key:
+            by_part[product.part_number_key] = product
+        if product.gtin_key:
+            by_gtin[product.gtin_key] = product
+    resolved = {}
+    for raw, (part_key, gtin_key) in keys.items():
+        product = by_part.get(part_key) or by_gtin.get(gtin_key)
+        if product is not None:
+            resolved[raw] = product
+    return resolved
+
+
+def lookup_code(keyword):
+    """
+    Exact-code fast path: the single product whose part number or GTIN matches
+    keyword, or None. Keywords without any digit are never treated as codes.
+    """
+    keyword = (keyword or '').strip()
+    if not keyword or len(keyword) > 50 or not any(ch.isdigit() for ch in keyword):
+        return None
+    query, _ = _code_filter([keyword])
+    if query is None:
+        return None
+    matches = list(Product.objects.select_related('category').filter(query)[:2])
+    return matches[0] if len(matches) == 1 else None
+
+
+# --------------------------
+# Public API
+# --------------------------
+def index_products(product_ids=None, batch_size=500):
+    """(Re)index the given products, or the whole catalog when product_ids is None."""
+    backend = get_backend()
+    with transaction.atomic():
+        if product_ids is None:
+            backend.clear()
+            indexed, last_pk = 0, 0
+            while True:
+                batch = list(_indexable().filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+                if not batch:
+                    return indexed
+                backend.index(batch)
+                indexed += len(batch)
+                last_pk = batch[-1].pk
+        products = list(_indexable(product_ids))
+        backend.index(products)
+        return len(products)
+
+
+def remove_products(product_ids):
+    get_backend().remove(product_ids)
+
+
+class SearchResults:
+    """
+    Lazy, sliceable result set so django.core.paginator.Paginator can page
+    relevance-ranked ids without materializing the whole match list.
+    """
+
+    def __init__(self, keyword, backend=None):
+        self.keyword = keyword
+        self.backend = backend or get_backend()
+        self._count = None
+
+    def count(self):
+        # Totals are cached per catalog version: deep pages and repeat queries skip COUNT(*)
+        if self._count is None:
+            key = 'store:search_count:%s:%s:%s' % (
+                self.backend.name, get_catalog_version(), hashlib.md5(self.keyword.lower().encode()).hexdigest(),
+            )
+            self._count = cache.get(key)
+            if self._count is None:
+                # Stamped with the catalog version, so never counted on a lagging replica
+                with primary():
+                    self._count = self.backend.count(self.keyword)
+                cache.set(key, self._count, COUNT_CACHE_SECONDS)
+        return self._count
+
+    @property
+    def cursor_kind(self):
+        # Scores from different backends are not comparable
+        return f'search:{self.backend.name}'
+
+    def page_after(self, cursor=None, limit=12):
+        """Keyset page after `cursor` = (score, id); returns (cards, next cursor or None)."""
+        if cursor is not None and (not isinstance(cursor[0], (int, float)) or isinstance(cursor[0], bool)):
+            # Scores are numeric; anything else cannot have come from this search
+            cursor = None
+        rows = self.backend.search_after(self.keyword, cursor, limit + 1)
+        ids = [pk for pk, _ in rows[:limit]]
+        next_cursor = (rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        return cards_in_order(ids), next_cursor
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        limit = (key.stop if key.stop is not None else self.count()) - offset
+        if limit <= 0:
+            return []
+        return cards_in_order(self.backend.search(self.keyword, offset, limit))
@@ -0,0 +1,122 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from category.menu import bump_menu_version
+from category.models import Category
+
+from . import search
+from .catalog import bump_catalog_version, bump_product_versions
+from .models import (
+    Brand, Product, ProductDownload, ProductGallery, ReviewRating, Variation, VariationCategory,
+)
+from .utils import refresh_product_cards, refresh_review_stats
+
+
+# --------------------------
+# Review aggregates
+# --------------------------
+@receiver(post_save, sender=ReviewRating)
+@receiver(post_delete, sender=ReviewRating)
+def update_review_stats(sender, instance, **kwargs):
+    refresh_review_stats(instance.product_id)
+    bump_catalog_version()
+
+
+# --------------------------
+# Search index
+# --------------------------
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_products(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_products(list(instance.product_set.values_list('pk', flat=True)))
+
+
+# --------------------------
+# Product cards
+# --------------------------
+@receiver(post_save, sender=Product)
+def refresh_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_product_cards([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_product_cards(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Brand)
+def refresh_brand_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_product_cards(instance.product_set.values_list('pk', flat=True))
+
+
+# --------------------------
+# Catalog version
+# --------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Variation)
+@receiver(post_delete, sender=Variation)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+# --------------------------
+# Product detail bundles
+# --------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_bundle_changed(sender, instance, **kwargs):
+    bump_product_versions([instance.pk])
+
+
+@receiver(post_save, sender=Variation)
+@receiver(post_delete, sender=Variation)
+@receiver(post_save, sender=ProductGallery)
+@receiver(post_delete, sender=ProductGallery)
+@receiver(post_save, sender=ProductDownload)
+@receiver(post_delete, sender=ProductDownload)
+@receiver(post_save, sender=ReviewRating)
+@receiver(post_delete, sender=ReviewRating)
+def product_part_changed(sender, instance, **kwargs):
+    bump_product_versions([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def product_group_changed(sender, instance, **kwargs):
+    bump_product_versions(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=VariationCategory)
+def variation_category_changed(sender, instance, **kwargs):
+    # Renaming an option category changes every variant matrix that uses it
+    bump_product_versions(instance.variation_set.values_list('product_id', flat=True).distinct())
+
+
+# --------------------------
+# Category menu
+# --------------------------
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_category_menu(sender, **kwargs):
+    bump_menu_version()
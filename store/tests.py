@@ -1,3 +1,568 @@
-from django.test import TestCase
+import time
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.http import HttpResponse, QueryDict
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from carts.context_processors import counter
+from category import menu
+from category.context_processors import menu_links
+from estore.db import routers
+
+from accounts.models import Account
+from category.models import Category
+from . import autocomplete, facets
+from .admin import ReviewRatingAdmin
+from .catalog import get_product_bundle, get_variant_matrix
+from .codes import gtin14, part_number_key
+from .context_processors import recently_viewed
+from .lazy import lazy_context
+from .detail import ProductDetailBundle, viewer_flags
+from .pagination import decode_cursor, encode_cursor
+from .search import BasicSearchBackend, SearchResults, get_backend
+from .utils import rebuild_review_stats
+from .variants import variation_signature
+from .models import (
+    Brand, Product, ProductCard, ProductDownload, ProductGallery, ReviewRating, Variation, VariationCategory,
+    Wishlist,
+)
+
+
+class ProductDetailQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.product = Product.objects.create(
+            product_name='Oxygen Regulator', slug='oxygen-regulator', price=100, stock=5,
+            category=cls.category, images='photos/products/regulator.jpg', has_variants=True,
+        )
+        cls.user = Account.objects.create_user(
+            first_name='Test', last_name='User', username='tester', email='tester@example.com', password='secret',
+        )
+        gas = VariationCategory.objects.create(name='Gas Type')
+        size = VariationCategory.objects.create(name='Size')
+        for name in ('Oxygen', 'Acetylene', 'Argon'):
+            Variation.objects.create(product=cls.product, category=gas, name=name)
+        for name in ('Small', 'Large'):
+            Variation.objects.create(product=cls.product, category=size, name=name, price_modifier=10)
+        for i in range(4):
+            reviewer = Account.objects.create_user(
+                first_name='R', last_name=str(i), username=f'r{i}', email=f'r{i}@example.com', password='secret',
+            )
+            ReviewRating.objects.create(product=cls.product, user=reviewer, subject=f'Review {i}', rating=4, status=True)
+        for i in range(3):
+            ProductGallery.objects.create(product=cls.product, image=f'store/products/g{i}.jpg')
+            ProductDownload.objects.create(product=cls.product, file=f'downloads/d{i}.pdf')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bundle_loads_in_fixed_number_of_queries(self):
+        with self.assertNumQueries(ProductDetailBundle.QUERY_COUNT):
+            bundle = ProductDetailBundle.load('regulators', 'oxygen-regulator')
+            variation_data = bundle.variation_data
+            names = [review.user.full_name() for review in bundle.reviews]
+            gallery = list(bundle.product_gallery)
+            downloads = list(bundle.product_downloads)
+            brand = bundle.product.brand
+            category_url = bundle.product.get_url()
+        self.assertEqual(sorted(variation_data), ['Gas Type', 'Size'])
+        self.assertEqual(len(names), 4)
+        self.assertEqual((len(gallery), len(downloads)), (3, 3))
+        self.assertIsNone(brand)
+        self.assertEqual(category_url, '/store/category/regulators/oxygen-regulator/')
+
+    def test_cached_bundle_needs_no_queries(self):
+        get_product_bundle('regulators', 'oxygen-regulator')
+        with self.assertNumQueries(0):
+            get_product_bundle('regulators', 'oxygen-regulator')
+
+    def test_cached_bundle_is_rebuilt_after_variation_change(self):
+        get_product_bundle('regulators', 'oxygen-regulator')
+        Variation.objects.create(product=self.product, category=VariationCategory.objects.get(name='Size'), name='Medium')
+        bundle = get_product_bundle('regulators', 'oxygen-regulator')
+        self.assertIn('Medium', [v['value'] for v in bundle.variation_data['Size']])
+
+    def test_admin_review_approval_rebuilds_bundle(self):
+        pending = ReviewRating.objects.create(product=self.product, user=self.user, subject='Pending', rating=1, status=False)
+        stale = get_product_bundle('regulators', 'oxygen-regulator')
+        self.assertEqual(len(stale.reviews), 4)
+        ReviewRatingAdmin(ReviewRating, admin.site).approve_reviews(None, ReviewRating.objects.filter(pk=pending.pk))
+        bundle = get_product_bundle('regulators', 'oxygen-regulator')
+        self.assertEqual(len(bundle.reviews), 5)
+        self.assertEqual((bundle.product.rating_count, bundle.product.rating_average), (5, 3.4))
+
+    def test_viewer_flags_for_signed_in_user(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(3):
+            flags = viewer_flags(request, self.product)
+        self.assertEqual(flags, {'in_cart': False, 'in_wishlist': False, 'orderproduct': False})
+
+
+class ReviewStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.product = Product.objects.create(
+            product_name='Oxygen Regulator', slug='oxygen-regulator', price=100, stock=5,
+            category=category, images='photos/products/regulator.jpg',
+        )
+        cls.users = [
+            Account.objects.create_user(
+                first_name='R', last_name=str(i), username=f'r{i}', email=f'r{i}@example.com', password='secret',
+            )
+            for i in range(3)
+        ]
+
+    def review(self, user, rating, status=True):
+        return ReviewRating.objects.create(product=self.product, user=user, subject='Review', rating=rating, status=status)
+
+    def stats(self):
+        return self.stats_of(self.product)
+
+    def stats_of(self, product):
+        card = ProductCard.objects.get(pk=product.pk)
+        product = Product.objects.get(pk=product.pk)
+        self.assertEqual((card.rating_average, card.rating_count), (product.rating_average, product.rating_count))
+        return product.rating_average, product.rating_count, product.rating_histogram
+
+    def test_stats_follow_review_create_approve_and_delete(self):
+        self.review(self.users[0], 5)
+        pending = self.review(self.users[1], 2, status=False)
+        self.assertEqual(self.stats()[:2], (5, 1))
+
+        pending.status = True
+        pending.save()
+        self.assertEqual(self.stats()[:2], (3.5, 2))
+
+        pending.delete()
+        self.assertEqual(self.stats()[:2], (5, 1))
+
+    def test_histogram_counts_half_stars_in_the_star_above(self):
+        self.review(self.users[0], 4.5)
+        self.review(self.users[1], 1)
+        self.review(self.users[2], 3, status=False)
+        self.assertEqual(self.stats()[2], {'1': 1, '2': 0, '3': 0, '4': 0, '5': 1})
+
+    def test_saving_a_stale_instance_keeps_the_stats(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.review(self.users[0], 4)
+        stale.price = 120
+        stale.save()
+        self.assertEqual(self.stats()[:2], (4, 1))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).price, 120)
+
+
+    def test_batched_rebuild_matches_incremental_stats(self):
+        category = Category.objects.get(slug='regulators')
+        products = [self.product] + [
+            Product.objects.create(
+                product_name=f'Hose {i}', slug=f'hose-{i}', price=10, stock=5,
+                category=category, images='photos/products/hose.jpg',
+            )
+            for i in range(4)
+        ]
+        for i, product in enumerate(products):
+            for user, rating in zip(self.users[:i % 3 + 1], (5, 3.5, 1)):
+                ReviewRating.objects.create(product=product, user=user, subject='Review', rating=rating, status=True)
+        expected = {product.pk: self.stats_of(product) for product in products}
+
+        Product.objects.update(rating_average=0, rating_count=0, rating_histogram={})
+        ProductCard.objects.update(rating_average=0, rating_count=0)
+        self.assertEqual(rebuild_review_stats(batch_size=2), len(products))
+        self.assertEqual({product.pk: self.stats_of(product) for product in products}, expected)
+
+class KeysetCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(category_name='Torches', slug='torches')
+        for i in range(15):
+            Product.objects.create(
+                product_name=f'Cutting Torch {i:02d}', slug=f'torch-{i}', price=10 + i, stock=5,
+                category=category, images='photos/products/torch.jpg',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def more(self, **params):
+        response = self.client.get('/store/more/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_continues_its_own_sort(self):
+        first = self.more(sort='name')
+        second = self.more(sort='name', cursor=first['next_cursor'])
+        self.assertEqual(len(first['products']) + len(second['products']), 15)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_cursor_from_another_sort_restarts(self):
+        by_name = self.more(sort='name')
+        by_price = self.more(sort='price')
+        replayed = self.more(sort='price', cursor=by_name['next_cursor'])
+        self.assertEqual(replayed['products'], by_price['products'])
+
+    def test_search_cursor_is_not_accepted_by_listings(self):
+        search = self.more(keyword='torch')
+        self.assertIsNotNone(search['next_cursor'])
+        replayed = self.more(cursor=search['next_cursor'])
+        self.assertEqual(replayed['products'], self.more()['products'])
+
+    def test_listing_cursor_is_not_accepted_by_search(self):
+        by_name = self.more(sort='name')
+        replayed = self.more(keyword='torch', cursor=by_name['next_cursor'])
+        self.assertEqual(replayed['products'], self.more(keyword='torch')['products'])
+
+    def test_search_ignores_non_numeric_cursor_keys(self):
+        for backend in {BasicSearchBackend(), get_backend()}:
+            results = SearchResults('torch', backend=backend)
+            first, _ = results.page_after(None, 12)
+            self.assertEqual(results.page_after(('Cutting Torch 05', 6), 12)[0], first)
+
+    def test_decode_rejects_other_kinds(self):
+        token = encode_cursor(('Cutting Torch 05', 6), 'listing:name')
+        self.assertEqual(decode_cursor(token, 'listing:name'), ('Cutting Torch 05', 6))
+        self.assertIsNone(decode_cursor(token, 'listing:price'))
+        self.assertIsNone(decode_cursor(token + 'x', 'listing:name'))
+
+
+@override_settings(DATABASE_ROUTERS=['estore.db.routers.CatalogReplicaRouter'])
+class CatalogReplicaRouterTests(TestCase):
+    """Routing decisions only: querysets report their alias, nothing is read from a replica."""
+
+    def setUp(self):
+        # The middleware only installs itself when a replica alias exists
+        patcher = mock.patch.dict(settings.DATABASES, {routers.REPLICA: settings.DATABASES['default']})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, view, session=None):
+        request = RequestFactory().get('/')
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        request.session.update(session or {})
+        routers.ReplicaPinningMiddleware(view)(request)
+        return request
+
+    def test_catalog_reads_use_the_replica_inside_requests(self):
+        seen = {}
+
+        def view(request):
+            seen.update(product=Product.objects.all().db, account=Account.objects.all().db)
+            return HttpResponse()
+
+        self.request(view)
+        self.assertEqual(seen, {'product': routers.REPLICA, 'account': routers.PRIMARY})
+        self.assertEqual(Product.objects.all().db, routers.PRIMARY)
+
+    def test_write_pins_rest_of_request_and_session(self):
+        seen = []
+
+        def view(request):
+            seen.append(Product.objects.all().db)
+            Category.objects.create(category_name='Hoses', slug='hoses')
+            seen.append(Product.objects.all().db)
+            return HttpResponse()
+
+        request = self.request(view)
+        self.assertEqual(seen, [routers.REPLICA, routers.PRIMARY])
+        self.assertGreater(request.session[routers.PIN_SESSION_KEY], time.time())
+
+    def test_pinned_session_reads_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(Product.objects.all().db)
+            return HttpResponse()
+
+        request = self.request(view, {routers.PIN_SESSION_KEY: time.time() + 60})
+        self.assertEqual(seen, [routers.PRIMARY])
+        self.request(view, {routers.PIN_SESSION_KEY: time.time() - 1})
+        self.assertEqual(seen, [routers.PRIMARY, routers.REPLICA])
+
+    def test_primary_block_passes_writes_to_outer_request(self):
+        state = {'primary': False, 'wrote': False}
+        token = routers._routing.set(state)
+        try:
+            with routers.primary():
+                self.assertEqual(Product.objects.all().db, routers.PRIMARY)
+                Category.objects.create(category_name='Gauges', slug='gauges')
+            self.assertEqual(state, {'primary': True, 'wrote': True})
+            self.assertEqual(Product.objects.all().db, routers.PRIMARY)
+        finally:
+            routers._routing.reset(token)
+
+    def test_read_only_primary_block_leaves_outer_request_on_replica(self):
+        state = {'primary': False, 'wrote': False}
+        token = routers._routing.set(state)
+        try:
+            with routers.primary():
+                list(Category.objects.all())
+            self.assertEqual(Product.objects.all().db, routers.REPLICA)
+        finally:
+            routers._routing.reset(token)
+
+
+class ProductCodeTests(SimpleTestCase):
+    def test_part_number_key_drops_case_and_separators(self):
+        for value in ('bd-16240', 'BD 16240', 'BD.16240', ' bd_16240 '):
+            self.assertEqual(part_number_key(value), 'BD16240')
+        self.assertIsNone(part_number_key(''))
+        self.assertIsNone(part_number_key(None))
+        self.assertIsNone(part_number_key('--'))
+
+    def test_gtin14_pads_valid_codes(self):
+        self.assertEqual(gtin14('96385074'), '00000096385074')
+        self.assertEqual(gtin14('012345678905'), '00012345678905')
+        self.assertEqual(gtin14('0-12345-67890-5'), '00012345678905')
+        self.assertEqual(gtin14('4006381333931'), '04006381333931')
+        self.assertEqual(gtin14('00012345678905'), '00012345678905')
+
+    def test_gtin14_keeps_upc_without_leading_zero(self):
+        self.assertEqual(gtin14('12345678905'), '00012345678905')
+
+    def test_gtin14_completes_missing_check_digit(self):
+        self.assertEqual(gtin14('9638507'), '00000096385074')
+        self.assertEqual(gtin14('03600029145'), '00036000291452')
+
+    def test_gtin14_rejects_bad_check_digits(self):
+        self.assertIsNone(gtin14('012345678901'))
+        self.assertIsNone(gtin14('4006381333932'))
+        self.assertIsNone(gtin14('00012345678901'))
+
+    def test_gtin14_rejects_non_codes(self):
+        for value in ('', None, 'abc', '123', '123456789012345'):
+            self.assertIsNone(gtin14(value))
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.brand = Brand.objects.create(name='Acme', slug='acme')
+        for name, slug, part_number, available in (
+            ('Acme Regulator', 'acme-regulator', 'BD-16240', True),
+            ('Regulator Gauge', 'regulator-gauge', None, True),
+            ('Regulator Stand', 'regulator-stand', None, False),
+        ):
+            Product.objects.create(
+                product_name=name, slug=slug, price=10, stock=5, category=cls.category, brand=cls.brand,
+                images='photos/products/p.jpg', manufacturer_part_number=part_number, is_available=available,
+            )
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._index.clear()
+
+    def labels(self, query):
+        return [(r['type'], r['label']) for r in autocomplete.suggest(query)]
+
+    def test_prefix_matches_word_starts_shortest_key_first(self):
+        self.assertEqual(self.labels('Regul'), [('product', 'Acme Regulator'), ('product', 'Regulator Gauge')])
+        self.assertEqual(self.labels('gau'), [('product', 'Regulator Gauge')])
+
+    def test_brand_ranks_before_its_products(self):
+        self.assertEqual(self.labels('acme'), [('brand', 'Acme'), ('product', 'Acme Regulator')])
+
+    def test_part_numbers_match_in_any_format(self):
+        for query in ('bd16', 'BD-162', 'bd 1624'):
+            self.assertEqual(self.labels(query), [('part_number', 'Acme Regulator')])
+
+    def test_short_and_unknown_queries(self):
+        self.assertEqual(self.labels('r'), [])
+        self.assertEqual(self.labels('stand'), [])
+
+    def test_index_is_rebuilt_after_catalog_change(self):
+        self.assertEqual(self.labels('hose'), [])
+        Product.objects.create(
+            product_name='Twin Hose', slug='twin-hose', price=10, stock=5, category=self.category,
+            images='photos/products/p.jpg',
+        )
+        self.assertEqual(self.labels('hose'), [('product', 'Twin Hose')])
+
+    def test_built_index_needs_no_queries(self):
+        autocomplete.suggest('acme')
+        with self.assertNumQueries(0):
+            autocomplete.suggest('regulator g')
+
+    def test_endpoint(self):
+        response = self.client.get('/store/autocomplete/', {'q': 'regulator g'})
+        self.assertEqual(response.json()['results'][0]['url'], '/store/category/regulators/regulator-gauge/')
+
+
+class FacetIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        regulators = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.hoses = Category.objects.create(category_name='Hoses', slug='hoses')
+        acme = Brand.objects.create(name='Acme', slug='acme')
+        gas = VariationCategory.objects.create(name='Gas Type')
+
+        def product(name, category, price, stock, brand=None):
+            return Product.objects.create(
+                product_name=name, slug=name.lower().replace(' ', '-'), price=price, stock=stock,
+                category=category, brand=brand, images='photos/products/p.jpg',
+            )
+        cls.acme_regulator = product('Acme Regulator', regulators, 80, 5, acme)
+        cls.basic_regulator = product('Basic Regulator', regulators, 300, 0)
+        cls.hose = product('Twin Hose', cls.hoses, 20, 3, acme)
+        Variation.objects.create(product=cls.acme_regulator, category=gas, name='Oxygen')
+        Variation.objects.create(product=cls.basic_regulator, category=gas, name='Argon')
+
+    def setUp(self):
+        cache.clear()
+        facets._index.clear()
+
+    def select(self, query):
+        index = facets.get_index()
+        return index, index.parse(QueryDict(query))
+
+    def ids(self, query, sort=''):
+        index, selected = self.select(query)
+        return index.product_ids(selected, sort)
+
+    def test_values_are_ored_within_a_facet_and_anded_across(self):
+        a, b, hose = self.acme_regulator.id, self.basic_regulator.id, self.hose.id
+        self.assertEqual(self.ids('category=regulators'), [a, b])
+        self.assertEqual(self.ids('category=regulators&brand=acme'), [a])
+        self.assertEqual(self.ids('price=0-50&price=50-100'), [a, hose])
+        self.assertEqual(self.ids('in_stock=1&category=regulators'), [a])
+        self.assertEqual(self.ids('option=Gas Type:Oxygen&option=Gas Type:Argon'), [a, b])
+        self.assertEqual(self.ids('category=unknown'), [a, b, hose])
+
+    def test_counts_leave_out_the_facets_own_selection(self):
+        index, selected = self.select('category=regulators&brand=acme')
+        self.assertEqual(index.count(selected), 1)
+        counts = {
+            group['group']: {value['value']: (value['count'], value['selected']) for value in group['values']}
+            for group in index.facets(selected, QueryDict('category=regulators&brand=acme'))
+        }
+        self.assertEqual(counts['category'], {'regulators': (1, True), 'hoses': (1, False)})
+        self.assertEqual(counts['brand'], {'acme': (1, True)})
+        self.assertEqual(counts['option:Gas Type'], {'Gas Type:Oxygen': (1, False)})
+
+    def test_sorted_keyset_pages(self):
+        index, selected = self.select('')
+        self.assertEqual(
+            self.ids('', sort='price'), [self.hose.id, self.acme_regulator.id, self.basic_regulator.id],
+        )
+        ids, cursor = index.page_after(selected, 'price', limit=2)
+        self.assertEqual(ids, [self.hose.id, self.acme_regulator.id])
+        self.assertEqual(index.page_after(selected, 'price', cursor, limit=2), ([self.basic_regulator.id], None))
+
+    def test_index_is_rebuilt_after_catalog_change(self):
+        index, selected = self.select('category=hoses')
+        self.assertEqual(index.count(selected), 1)
+        Product.objects.create(
+            product_name='Single Hose', slug='single-hose', price=15, stock=1, category=self.hoses,
+            images='photos/products/p.jpg',
+        )
+        index, selected = self.select('category=hoses')
+        self.assertEqual(index.count(selected), 2)
+
+
+class LazyContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(category_name='Regulators', slug='regulators')
+
+    def setUp(self):
+        cache.clear()
+        menu._menu.clear()
+        self.request = RequestFactory().get('/store/')
+        self.request.user = AnonymousUser()
+        self.request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        self.request.session['viewed_products'] = [1, 2]
+
+    def test_unused_values_are_never_evaluated(self):
+        with self.assertNumQueries(0):
+            context = {**menu_links(self.request), **recently_viewed(self.request), **counter(self.request)}
+            Template('{{ request.path }}').render(Context(context))
+        self.assertFalse(hasattr(self.request, 'context_timings'))
+
+    def test_used_value_is_evaluated_once_and_timed(self):
+        context = {**menu_links(self.request), **recently_viewed(self.request)}
+        template = Template('{% for link in links %}{{ link.slug }}{% endfor %}{% if links %}!{% endif %}')
+        with self.assertNumQueries(1):
+            self.assertEqual(template.render(Context(context)), 'regulators!')
+        self.assertEqual(list(self.request.context_timings), ['links'])
+
+    def test_value_is_computed_on_first_use(self):
+        calls = []
+        value = lazy_context(self.request, 'answer', lambda: calls.append(1) or [42])
+        self.assertEqual(calls, [])
+        self.assertEqual((list(value), len(value)), ([42], 1))
+        self.assertEqual(calls, [1])
+
+
+class VariationSignatureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.product = Product.objects.create(
+            product_name='Oxygen Regulator', slug='oxygen-regulator', price=100, stock=5,
+            category=category, images='photos/products/regulator.jpg', has_variants=True,
+        )
+        cls.user = Account.objects.create_user(
+            first_name='Test', last_name='User', username='tester', email='tester@example.com', password='secret',
+        )
+
+    def test_signature_ignores_order_and_duplicates(self):
+        self.assertEqual(variation_signature([3, 1, 2]), variation_signature(['2', 1, 3, 3]))
+        self.assertNotEqual(variation_signature([1, 2]), variation_signature([1, 2, 3]))
+        self.assertEqual(variation_signature([]), '')
+
+    def test_one_wishlist_line_per_product_and_signature(self):
+        Wishlist.objects.create(user=self.user, product=self.product, variation_signature=variation_signature([1, 2]))
+        Wishlist.objects.create(user=self.user, product=self.product, variation_signature='')
+        with self.assertRaises(IntegrityError):
+            Wishlist.objects.create(user=self.user, product=self.product, variation_signature=variation_signature([2, 1]))
+
+
+class VariantMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(category_name='Regulators', slug='regulators')
+        cls.product = Product.objects.create(
+            product_name='Oxygen Regulator', slug='oxygen-regulator', price=100, stock=5,
+            category=category, images='photos/products/regulator.jpg', has_variants=True,
+        )
+        gas = VariationCategory.objects.create(name='Gas Type')
+        cls.size = VariationCategory.objects.create(name='Size')
+        cls.oxygen = Variation.objects.create(product=cls.product, category=gas, name='Oxygen')
+        cls.argon = Variation.objects.create(product=cls.product, category=gas, name='Argon', price_modifier=5)
+        cls.large = Variation.objects.create(product=cls.product, category=cls.size, name='Large', price_modifier=10)
+        Variation.objects.create(product=cls.product, category=cls.size, name='Small', is_active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_select_normalizes_names_and_values(self):
+        matrix = get_variant_matrix(self.product.id)
+        self.assertEqual(
+            matrix.select({'gas type': ' ARGON ', 'Size': 'large', 'quantity': '2'}), ([self.argon.id, self.large.id], True),
+        )
+        self.assertEqual(matrix.select({'Gas Type': 'Oxygen'}), ([self.oxygen.id], False))
+        self.assertEqual(matrix.select({'Gas Type': 'Oxygen', 'Size': 'Small'}), ([self.oxygen.id], False))
+
+    def test_select_ids_needs_one_active_option_per_category(self):
+        matrix = get_variant_matrix(self.product.id)
+        self.assertTrue(matrix.select_ids([self.large.id, self.oxygen.id]))
+        self.assertFalse(matrix.select_ids([self.oxygen.id]))
+        self.assertFalse(matrix.select_ids([self.oxygen.id, self.argon.id]))
+        self.assertFalse(matrix.select_ids([self.oxygen.id, Variation.objects.get(name='Small').id]))
+        self.assertEqual(matrix.price_modifier([self.argon.id, self.large.id]), 15)
+
+    def test_matrix_is_cached_until_a_variation_changes(self):
+        get_variant_matrix(self.product.id)
+        with self.assertNumQueries(0):
+            get_variant_matrix(self.product.id)
+        Variation.objects.create(product=self.product, category=self.size, name='Medium')
+        self.assertTrue(get_variant_matrix(self.product.id).select({'Size': 'medium', 'Gas Type': 'argon'})[1])
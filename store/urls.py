@@ -8,6 +8,8 @@ urlpatterns = [
     path('category/<slug:category_slug>/', views.store, name='products_by_category'),
     path('category/<slug:category_slug>/<slug:product_slug>/', views.product_detail, name='product_detail'),
     path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('more/', views.load_more, name='load_more'),
     path('submit_review/<int:product_id>/', views.submit_review, name='submit_review'),
     path('brands/<slug:brand_slug>/', views.brand_detail, name='brand_detail'),
     path('wishlist/', views.wishlist, name='wishlist'),
@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+
+from . import codes
+from .models import Product, ProductCard
+
+STAR_BUCKETS = (1, 2, 3, 4, 5)
+
+
+def _review_stats_aggregates():
+    """
+    Aggregate expressions for one pass over approved reviews.
+    Half-star ratings are counted in the star above them (4.5 -> '5').
+    """
+    approved = Q(reviewrating__status=True)
+    aggregates = {
+        'avg': Avg('reviewrating__rating', filter=approved),
+        'count': Count('reviewrating', filter=approved),
+    }
+    for star in STAR_BUCKETS:
+        in_bucket = Q(reviewrating__rating__lte=star)
+        if star > 1:
+            in_bucket &= Q(reviewrating__rating__gt=star - 1)
+        aggregates[f'star_{star}'] = Count('reviewrating', filter=approved & in_bucket)
+    return aggregates
+
+
+def _stats_from_row(row):
+    count = row['count'] or 0
+    return {
+        'rating_average': round(float(row['avg']), 2) if count else 0,
+        'rating_count': count,
+        'rating_histogram': {str(star): row[f'star_{star}'] for star in STAR_BUCKETS},
+    }
+
+
+def cards_in_order(ids):
+    """ProductCards for `ids` in that order: one query for a whole listing page."""
+    cards = ProductCard.objects.in_bulk(ids)
+    return [cards[pk] for pk in ids if pk in cards]
+
+
+CARD_FIELDS = [
+    'product_name', 'url', 'thumbnail_url', 'price', 'in_stock', 'is_available', 'has_variants',
+    'category_slug', 'brand_slug', 'rating_average', 'rating_count', 'created_date',
+]
+
+
+def _card_for(product):
+    return ProductCard(
+        product_id=product.pk,
+        product_name=product.product_name,
+        url=product.get_url(),
+        thumbnail_url=product.images.url if product.images else '',
+        price=product.price,
+        in_stock=product.stock > 0,
+        is_available=product.is_available,
+        has_variants=product.has_variants,
+        category_slug=product.category.slug,
+        brand_slug=product.brand.slug if product.brand_id else '',
+        rating_average=product.rating_average,
+        rating_count=product.rating_count,
+        created_date=product.created_date,
+    )
+
+
+def refresh_product_cards(product_ids=None, batch_size=500):
+    """
+    Upsert the ProductCard rows of the given products (whole catalog when None).
+    Returns the number of cards written.
+    """
+    written, last_pk = 0, 0
+    base = Product.objects.select_related('category', 'brand').order_by('pk')
+    if product_ids is not None:
+        base = base.filter(pk__in=list(product_ids))
+    while True:
+        batch = list(base.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return written
+        ProductCard.objects.bulk_create(
+            [_card_for(product) for product in batch],
+            update_conflicts=True, unique_fields=['product'], update_fields=CARD_FIELDS,
+        )
+        written += len(batch)
+        last_pk = batch[-1].pk
+
+
+def refresh_review_stats(product_id):
+    """
+    Recompute the denormalized rating columns of a single product.
+    Uses queryset.update() so modified_date and Product.save() side effects are untouched.
+    """
+    with transaction.atomic():
+        row = (
+            Product.objects.filter(pk=product_id)
+            .values('pk')
+            .annotate(**_review_stats_aggregates())
+            .first()
+        )
+        if row is None:
+            return
+        stats = _stats_from_row(row)
+        Product.objects.filter(pk=product_id).update(**stats)
+        ProductCard.objects.filter(pk=product_id).update(
+            rating_average=stats['rating_average'], rating_count=stats['rating_count'],
+        )
+
+
+def rebuild_review_stats(batch_size=500):
+    """
+    Recompute rating columns for the whole catalog in one grouped query per batch.
+    Returns the number of products updated.
+    """
+    # Keyset batches, each read in full before it is written: a streamed
+    # iterator() would be reading Product while bulk_update writes it, and
+    # SQLite gives no isolation between statements on one connection.
+    updated, last_pk = 0, 0
+    while True:
+        rows = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values('pk').annotate(**_review_stats_aggregates())[:batch_size]
+        )
+        if not rows:
+            break
+        updated += _flush_stats([Product(pk=row['pk'], **_stats_from_row(row)) for row in rows])
+        last_pk = rows[-1]['pk']
+    refresh_product_cards(batch_size=batch_size)
+    return updated
+
+
+def _flush_stats(batch):
+    with transaction.atomic():
+        Product.objects.bulk_update(batch, ['rating_average', 'rating_count', 'rating_histogram'])
+    return len(batch)
+
+
+def backfill_code_keys(batch_size=500):
+    """
+    Recompute part_number_key / gtin_key for every product with bulk updates.
+    Returns the number of products whose keys changed.
+    """
+    changed, last_pk = 0, 0
+    while True:
+        batch = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('id', 'manufacturer_part_number', 'gtin', 'upc_ean', 'part_number_key', 'gtin_key')[:batch_size]
+        )
+        if not batch:
+            return changed
+        dirty = []
+        for product in batch:
+            part_key = codes.part_number_key(product.manufacturer_part_number)
+            gtin_key = codes.gtin14(product.gtin) or codes.gtin14(product.upc_ean)
+            if (part_key, gtin_key) != (product.part_number_key, product.gtin_key):
+                product.part_number_key, product.gtin_key = part_key, gtin_key
+                dirty.append(product)
+        if dirty:
+            Product.objects.bulk_update(dirty, ['part_number_key', 'gtin_key'])
+            changed += len(dirty)
+        last_pk = batch[-1].pk
@@ -0,0 +1,101 @@
+"""
+Per-product variant matrix.
+
+Everything add_cart, add_to_wishlist and the product page need to know about a
+product's active variations, built from one query: the option categories a
+shopper must choose from, and a map from normalized (category, value) pairs to
+variation id and price modifier. Cached per product by
+store.catalog.get_variant_matrix() under the product's version stamp, so any
+Variation save or delete invalidates it.
+
+variation_signature() is the matching identity of a cart or wishlist line:
+the same product with the same set of variations is the same line.
+"""
+import hashlib
+
+from .models import Variation
+
+
+def variation_signature(variation_ids):
+    """
+    Order-independent key for a set of selected variations: SHA-1 of the
+    sorted, de-duplicated ids. No variations -> "".
+    """
+    ids = sorted({int(pk) for pk in variation_ids})
+    if not ids:
+        return ''
+    return hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()
+
+
+def _normalize(text):
+    return ' '.join(str(text or '').split()).casefold()
+
+
+class VariantMatrix:
+    def __init__(self, rows):
+        # rows: (id, category name or None, value, price modifier), in id order
+        self.options = []
+        self.categories = []
+        self.lookup = {}
+        for pk, category_name, value, price_modifier in rows:
+            option = {
+                'id': pk,
+                'category': category_name,
+                'value': value,
+                'price_modifier': price_modifier,
+            }
+            self.options.append(option)
+            if category_name is None:
+                continue
+            if category_name not in self.categories:
+                self.categories.append(category_name)
+            self.lookup.setdefault((_normalize(category_name), _normalize(value)), option)
+
+    @classmethod
+    def load(cls, product_id):
+        rows = (
+            Variation.objects.filter(product_id=product_id, is_active=True)
+            .order_by('id')
+            .values_list('id', 'category__name', 'name', 'price_modifier')
+        )
+        return cls(list(rows))
+
+    def __bool__(self):
+        return bool(self.options)
+
+    def select(self, data):
+        """
+        Variation ids chosen in `data` (e.g. request.POST: category name -> value),
+        one per category, plus whether every category got a valid choice.
+        """
+        chosen = {_normalize(key): value for key, value in data.items()}
+        ids = []
+        for category_name in self.categories:
+            key = _normalize(category_name)
+            option = self.lookup.get((key, _normalize(chosen.get(key))))
+            if option is not None:
+                ids.append(option['id'])
+        return ids, len(ids) == len(self.categories)
+
+    def select_ids(self, variation_ids):
+        """Whether `variation_ids` are active options of this product, exactly one per category."""
+        by_id = {o['id']: o for o in self.options}
+        if any(pk not in by_id for pk in variation_ids):
+            return False
+        chosen = [by_id[pk]['category'] for pk in variation_ids if by_id[pk]['category'] is not None]
+        return len(chosen) == len(set(chosen)) == len(self.categories)
+
+    def price_modifier(self, variation_ids):
+        wanted = set(variation_ids)
+        return sum((o['price_modifier'] for o in self.options if o['id'] in wanted), 0)
+
+    def grouped(self):
+        """Options grouped by category name, in the shape the product template and JS expect."""
+        data = {}
+        for option in self.options:
+            data.setdefault(option['category'] or "Other", []).append({
+                'id': option['id'],
+                'value': option['value'],
+                'price_modifier': float(option['price_modifier']),
+            })
+        return data
@@ -1,68 +1,136 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.csrf import csrf_protect
-from carts.models import CartItem
-from carts.utils import _cart_id
-from orders.models import OrderProduct
 from .forms import ReviewForm
-from .models import Product, ReviewRating, ProductGallery, ProductDownload, Brand, Wishlist, Variation
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.db.models import Q
+from .search import SearchResults, lookup_code
+from .autocomplete import suggest
+from . import facets
+from .catalog import get_product_bundle, get_variant_matrix
+from .detail import viewer_flags
+from .pagination import CursorPage, decode_cursor, encode_cursor
+from .utils import cards_in_order
+from .variants import variation_signature
+from .models import Product, ReviewRating, Brand, Wishlist
+from django.core.paginator import Paginator
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 
 
-def store(request, category_slug=None):
-    products = None
-    if category_slug is not None:
-        products = Product.objects.filter(category__slug=category_slug, is_available=True)
-        paginator = Paginator(products, 12)
-        page = request.GET.get('page')
-        paged_products = paginator.get_page(page)
-        product_count = products.count()
+PRODUCTS_PER_PAGE = 12
+
+
+def _page_query(request, drop=('page', 'cursor')):
+    """Current query string minus paging params, ready to prefix a page/cursor link."""
+    params = request.GET.copy()
+    for key in drop:
+        params.pop(key, None)
+    query = params.urlencode()
+    return f'{query}&' if query else ''
+
+
+def _sort_options(request, current):
+    options = []
+    for value, (label, _) in facets.SORTS.items():
+        params = request.GET.copy()
+        for key in ('page', 'cursor', 'sort'):
+            params.pop(key, None)
+        if value:
+            params['sort'] = value
+        options.append({'value': value, 'label': label, 'query': params.urlencode(), 'selected': value == current})
+    return options
+
+
+def _listing_page(request, fixed, keyset=False):
+    """
+    Products for the query-string facets, as a numbered Page or, in keyset mode
+    (or when ?cursor= is present), a CursorPage. Returns (index, selected, sort, page).
+    """
+    index = facets.get_index()
+    selected = index.parse(request.GET)
+    for group, value in fixed.items():
+        selected[group] = {value}
+    sort = request.GET.get('sort', '')
+    if sort not in facets.SORTS:
+        sort = ''
+
+    if keyset or 'cursor' in request.GET:
+        kind = f'listing:{sort}'
+        ids, last = index.page_after(selected, sort, decode_cursor(request.GET.get('cursor'), kind), PRODUCTS_PER_PAGE)
+        page = CursorPage(
+            cards_in_order(ids),
+            next_cursor=encode_cursor(last, kind) if last else None,
+            total=index.count(selected),
+        )
     else:
-        products = Product.objects.all().filter(is_available=True).order_by('id')
-        paginator = Paginator(products, 12)
-        page = request.GET.get('page')
-        paged_products = paginator.get_page(page)
-        product_count = products.count()
+        paginator = Paginator(index.product_ids(selected, sort), PRODUCTS_PER_PAGE)
+        page = paginator.get_page(request.GET.get('page'))
+        page.object_list = cards_in_order(list(page.object_list))
+    return index, selected, sort, page
 
-    context = {
-        'products': paged_products,
+
+def _faceted_listing(request, fixed):
+    """
+    Listing context: products plus facet counts for the selected query-string facets.
+    `fixed` maps a facet group to the value pinned by the URL (category or brand page).
+    """
+    index, selected, sort, page = _listing_page(request, fixed)
+    if isinstance(page, CursorPage):
+        product_count, next_cursor = page.total, page.next_cursor
+    else:
+        product_count, next_cursor = page.paginator.count, None
+    return {
+        'products': page,
         'product_count': product_count,
+        'next_cursor': next_cursor,
+        'facets': index.facets(selected, request.GET, fixed=fixed),
+        'facets_active': any(group not in fixed for group in selected),
+        'sort_options': _sort_options(request, sort),
+        'page_query': _page_query(request),
     }
+
+
+def store(request, category_slug=None):
+    fixed = {'category': category_slug} if category_slug is not None else {}
+    context = _faceted_listing(request, fixed)
     return render(request, 'store/store.html', context)
 
-def product_detail(request, category_slug, product_slug):
-    single_product = get_object_or_404(Product, category__slug=category_slug, slug=product_slug)
-    in_cart = CartItem.objects.filter(cart__cart_id=_cart_id(request), product=single_product).exists()
-    product = Product.objects.get(category__slug=category_slug, slug=product_slug)
-    variations = Variation.objects.filter(product=product, is_active=True)
 
-    if request.user.is_authenticated:
-        try:
-            orderproduct = OrderProduct.objects.filter(user=request.user, product_id=single_product.id).exists()
-        except OrderProduct.DoesNotExist:
-            orderproduct = None
+def load_more(request):
+    """
+    JSON keyset page for "load more" buttons and crawlers: takes the same
+    facet/sort params as the listings (or ?keyword= for search) plus ?cursor=.
+    """
+    keyword = request.GET.get('keyword', '').strip()
+    if keyword:
+        results = SearchResults(keyword)
+        products, last = results.page_after(decode_cursor(request.GET.get('cursor'), results.cursor_kind), PRODUCTS_PER_PAGE)
+        page = CursorPage(products, encode_cursor(last, results.cursor_kind) if last else None, results.count())
     else:
-        orderproduct = None
+        _, _, _, page = _listing_page(request, {}, keyset=True)
+    return JsonResponse({
+        'products': [
+            {
+                'id': card.product_id,
+                'name': card.product_name,
+                'url': card.url,
+                'image': card.thumbnail_url,
+                'price': str(card.price),
+                'in_stock': card.in_stock,
+                'rating': card.rating_average,
+                'rating_count': card.rating_count,
+            }
+            for card in page
+        ],
+        'next_cursor': page.next_cursor,
+        'total': page.total,
+    })
 
-    reviews = ReviewRating.objects.filter(product_id=single_product.id, status=True)
-    product_gallery = ProductGallery.objects.filter(product_id=single_product.id)
-    product_downloads = ProductDownload.objects.filter(product=single_product)
-    viewed_products = request.session.get('viewed_products', [])
+def product_detail(request, category_slug, product_slug):
+    bundle = get_product_bundle(category_slug, product_slug)
+    single_product = bundle.product
+    flags = viewer_flags(request, single_product)
 
-    # Group variations by category
-    variation_data = {}
-    for v in variations:
-        category_name = v.category.name if v.category else "Other"
-        if category_name not in variation_data:
-            variation_data[category_name] = []
-        variation_data[category_name].append({
-            'id': v.id,
-            'value': v.name,
-            'price_modifier': float(v.price_modifier),
-        })
+    viewed_products = request.session.get('viewed_products', [])
 
     if single_product.id not in viewed_products:
         viewed_products.insert(0, single_product.id)
@@ -72,29 +140,47 @@ def product_detail(request, category_slug, product_slug):
 
     context = {
         'single_product': single_product,
-        'in_cart': in_cart,
-        'orderproduct': orderproduct,
-        'reviews': reviews,
-        'product_gallery': product_gallery,
-        'product_downloads': product_downloads,
-        'variation_data': variation_data,
+        'in_cart': flags['in_cart'],
+        'in_wishlist': flags['in_wishlist'],
+        'orderproduct': flags['orderproduct'],
+        'reviews': bundle.reviews,
+        'product_gallery': bundle.product_gallery,
+        'product_downloads': bundle.product_downloads,
+        'variation_data': bundle.variation_data,
     }
     return render(request, 'store/product_detail.html', context)
 
 
 def search(request):
-    if 'keyword' in request.GET:
-        keyword = request.GET['keyword']
-        if keyword:
-            products = Product.objects.order_by('-created_date').filter(
-                Q(description__icontains=keyword) | Q(product_name__icontains=keyword)
-            )
-            product_count = products.count()
-        context = {
-            'products': products,
-            'product_count': product_count,
-        }
-        return render(request, 'store/store.html', context)
+    keyword = request.GET.get('keyword', '').strip()
+    if keyword and 'page' not in request.GET and 'cursor' not in request.GET:
+        product = lookup_code(keyword)
+        if product is not None:
+            return redirect(product.get_url())
+    results = SearchResults(keyword) if keyword else []
+    next_cursor = None
+    if keyword and 'cursor' in request.GET:
+        products, last = results.page_after(decode_cursor(request.GET['cursor'], results.cursor_kind), PRODUCTS_PER_PAGE)
+        paged_products = CursorPage(products, total=results.count())
+        next_cursor = encode_cursor(last, results.cursor_kind) if last else None
+        product_count = paged_products.total
+    else:
+        paginator = Paginator(results, PRODUCTS_PER_PAGE)
+        paged_products = paginator.get_page(request.GET.get('page'))
+        product_count = paginator.count
+    context = {
+        'products': paged_products,
+        'product_count': product_count,
+        'next_cursor': next_cursor,
+        'keyword': keyword,
+        'page_query': _page_query(request),
+    }
+    return render(request, 'store/store.html', context)
+
+
+def autocomplete(request):
+    query = request.GET.get('q', '')
+    return JsonResponse({'query': query, 'results': suggest(query)})
 
 
 def submit_review(request, product_id):
@@ -123,11 +209,8 @@ def submit_review(request, product_id):
 
 def brand_detail(request, brand_slug):
     brand = get_object_or_404(Brand, slug=brand_slug)
-    products = Product.objects.filter(brand=brand, is_available=True).order_by('id')
-    paginator = Paginator(products, 12)
-    page = request.GET.get('page')
-    paged_products = paginator.get_page(page)
-    context = {'brand': brand, 'products': paged_products}
+    context = _faceted_listing(request, {'brand': brand.slug})
+    context['brand'] = brand
     return render(request, 'store/brand_detail.html', context)
 
 @login_required(login_url='login')
@@ -161,23 +244,8 @@ def add_to_wishlist(request, product_id):
     if request.method == 'POST':
         quantity = int(request.POST.get('quantity', 1))
         if product.has_variants:
-            valid_categories = set(
-                Variation.objects.filter(product=product, is_active=True)
-                .values_list('category__name', flat=True)
-            )
-            for key, value in request.POST.items():
-                if key in valid_categories:
-                    try:
-                        variation = Variation.objects.get(
-                            product=product,
-                            category__name__iexact=key,
-                            name__iexact=value,
-                            is_active=True
-                        )
-                        product_variations.append(variation)
-                    except Variation.DoesNotExist:
-                        continue
-            if len(product_variations) != len(valid_categories):
+            product_variations, complete = get_variant_matrix(product.id).select(request.POST)
+            if not complete:
                 if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                     return JsonResponse({
                         'success': False,  # 👈 added
@@ -192,40 +260,28 @@ def add_to_wishlist(request, product_id):
         if wishlist_data.get('product_id') == str(product_id):
             quantity = int(wishlist_data.get('quantity', 1))
             if product.has_variants:
-                valid_categories = set(
-                    Variation.objects.filter(product=product, is_active=True).values_list('category', flat=True))
-                for key, value in wishlist_data.get('variations', {}).items():
-                    if key in valid_categories:
-                        try:
-                            variation = Variation.objects.get(
-                                product=product,
-                                category__name__iexact=key,
-                                name__iexact=value,
-                                is_active=True
-                            )
-                            product_variations.append(variation)
-                        except Variation.DoesNotExist:
-                            continue
-                if len(product_variations) != len(valid_categories):
+                product_variations, complete = get_variant_matrix(product.id).select(wishlist_data.get('variations', {}))
+                if not complete:
+                    product_variations = []
                     messages.error(request, "Invalid variations; item added without variations.")
 
-    existing_items = Wishlist.objects.filter(user=request.user, product=product)
-    for item in existing_items:
-        existing_variations = set(item.variations.all())
-        if existing_variations == set(product_variations):
-            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                return JsonResponse({
-                    'status': 'exists',
-                    'message': 'This item is already in your wishlist.',
-                    'in_wishlist': True
-                }, status=200)
-            messages.info(request, "This item is already in your wishlist.")
-            return redirect('/store/wishlist/')
-
-    wishlist_item = Wishlist.objects.create(user=request.user, product=product, quantity=quantity)
+    signature = variation_signature(product_variations)
+    wishlist_item, created = Wishlist.objects.get_or_create(
+        user=request.user, product=product, variation_signature=signature,
+        defaults={'quantity': quantity},
+    )
+    if not created:
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({
+                'status': 'exists',
+                'message': 'This item is already in your wishlist.',
+                'in_wishlist': True
+            }, status=200)
+        messages.info(request, "This item is already in your wishlist.")
+        return redirect('/store/wishlist/')
+
     if product_variations:
         wishlist_item.variations.set(product_variations)
-    wishlist_item.save()
     if 'wishlist_data' in request.session:
         del request.session['wishlist_data']
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':